@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the MCP2221A Filament Sensor Plugin sampling and detection pipeline
+
+Every benchmark runs against the simulated bridge. Results are reported with
+pytest-benchmark style statistics and compared against a JSON baseline:
+
+    python benchmark_plugin.py            # compare with benchmark_baseline.json
+    python benchmark_plugin.py --save     # record a new baseline
+"""
+
+import argparse
+import heapq
+import json
+import os
+import platform
+import queue
+import statistics
+import sys
+import time
+import logging
+
+from test_plugin import configured_plugin
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+DEFAULT_TOLERANCE = 0.5  # Allowed median slowdown against the baseline before failing
+
+def pipeline_plugin(extruder_count, **overrides):
+    """Plugin with ``extruder_count`` extruders on mock bridges, two per bridge as on real hardware"""
+    settings = {
+        "use_mock": True,
+        "devices": ",".join(f"bench{index}" for index in range((extruder_count + 1) // 2)),
+        "extruder_count": extruder_count,
+        "journal_enabled": False,
+        "status_push_max_rate": 0,
+    }
+    for extruder_idx in range(extruder_count):
+        settings[f"e{extruder_idx}_enabled"] = True
+        settings[f"e{extruder_idx}_device"] = extruder_idx // 2
+    settings.update(overrides)
+
+    plugin = configured_plugin(**settings)
+    plugin._printer = None
+    plugin._initialize_hardware()
+    plugin.is_printing = True
+    return plugin
+
+def summarize(samples, rounds, iterations):
+    """pytest-benchmark style statistics over per-operation samples in seconds"""
+    mean = statistics.mean(samples)
+    return {
+        "min": min(samples),
+        "max": max(samples),
+        "mean": mean,
+        "median": statistics.median(samples),
+        "stddev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "rounds": rounds,
+        "iterations": iterations,
+        "ops": 1.0 / mean if mean else 0.0,
+    }
+
+def run_timed(func, rounds, iterations):
+    """Time ``rounds`` calls of ``func(iterations)``, returning statistics per iteration"""
+    func(iterations)  # Warm-up
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func(iterations)
+        samples.append((time.perf_counter() - start) / iterations)
+    return summarize(samples, rounds, iterations)
+
+def bench_sensor_state_update():
+    """SensorState.update throughput on a polled motion pulse train with occasional glitches"""
+    from octoprint_mcp2221_filament_sensor.mcp2221_filament_sensor import SensorState
+
+    sensor = SensorState(pin=1, sensor_type="motion", debounce_time=0.002)
+    inputs = [(((index // 4) % 2 == 1) != (index % 37 == 0), 1000.0 + index * 0.005) for index in range(1000)]
+
+    def run(iterations):
+        update = sensor.update
+        for _ in range(iterations // len(inputs)):
+            for value, timestamp in inputs:
+                update(value, timestamp)
+
+    return run_timed(run, rounds=20, iterations=10000)
+
+def bench_check_sensors(extruder_count):
+    """One _check_sensors cycle, including the concurrent reads of every bridge"""
+    plugin = pipeline_plugin(extruder_count)
+
+    def run(iterations):
+        for _ in range(iterations):
+            with plugin.monitor_lock:
+                plugin._check_sensors()
+
+    try:
+        return run_timed(run, rounds=20, iterations=50)
+    finally:
+        plugin._cleanup_hardware()
+
+def bench_evaluate_samples(extruder_count):
+    """Batch evaluation per sample of a polled burst, extruders feeding at ~40 mm/s"""
+    from octoprint_mcp2221_filament_sensor.mcp2221_filament_sensor import SensorBank
+
+    plugin = pipeline_plugin(extruder_count)
+    plugin._cleanup_hardware()
+    bank = plugin.sensors
+    active = [True] * len(bank)
+    scope = (1 << (SensorBank.PINS_PER_DEVICE * len(bank.device_masks))) - 1
+
+    # Filament present on every runout pin, each motion pin toggling every 4 samples (20ms levels at 5ms polling)
+    present = 0
+    motion = 0
+    for slot in range(len(bank)):
+        present |= 1 << (SensorBank.PINS_PER_DEVICE * bank.devices[slot] + bank.runout[slot].pin)
+        motion |= 1 << (SensorBank.PINS_PER_DEVICE * bank.devices[slot] + bank.motion[slot].pin)
+    rounds, iterations = 20, 1000
+    samples = [
+        (1000.0 + index * 0.005, present | (motion if index // 4 % 2 else 0), scope, 0)
+        for index in range((rounds + 1) * iterations)
+    ]
+    position = [0]
+
+    def run(iterations):
+        start = position[0]
+        position[0] += iterations
+        plugin._evaluate_samples(plugin.config, samples[start:start + iterations], active)
+
+    return run_timed(run, rounds=rounds, iterations=iterations)
+
+def bench_burst_drain(extruder_count, shared=False):
+    """Cost per burst read of buffering, reducing and evaluating a 1kHz trace, extruders feeding at ~40 mm/s"""
+    from octoprint_mcp2221_filament_sensor.mcp2221_filament_sensor import (
+        FAST_POLL_INTERVAL, SampleRing, SensorBank, SharedSampleRing
+    )
+
+    plugin = pipeline_plugin(extruder_count)
+    plugin._cleanup_hardware()
+    bank = plugin.sensors
+    active = [True] * len(bank)
+    shift = SensorBank.PINS_PER_DEVICE
+    device_count = len(bank.device_masks)
+    rings = [SharedSampleRing(4096) if shared else SampleRing(4096) for _ in range(device_count)]
+
+    # Filament present on GP0 and GP2, the motion pins GP1 and GP3 toggling every 20 reads
+    rounds, iterations = 20, 1000
+    origin_ns = 1000 * 10 ** 9
+    reads = [(origin_ns + index * 10 ** 6, 0b0101 | (0b1010 if index // 20 % 2 else 0))
+             for index in range((rounds + 1) * iterations)]
+    position = [0]
+
+    def run(iterations):
+        start = position[0]
+        position[0] += iterations
+        batch = reads[start:start + iterations]
+        traces = []
+        for device, ring in enumerate(rings):
+            push = ring.push
+            for timestamp, value in batch:
+                push(timestamp, value)
+            traces.append([(timestamp * 1e-9, value << (shift * device), 0xF << (shift * device), 0)
+                           for timestamp, value in ring.drain_edges(0xF, int(FAST_POLL_INTERVAL * 1e9))])
+        plugin._evaluate_samples(plugin.config, heapq.merge(*traces), active)
+
+    try:
+        stats = run_timed(run, rounds=rounds, iterations=iterations)
+    finally:
+        if shared:
+            for ring in rings:
+                ring.close(unlink=True)
+    for key in ("min", "max", "mean", "median", "stddev"):
+        stats[key] /= device_count  # Per bridge read
+    stats["ops"] *= device_count
+    return stats
+
+def bench_get_status():
+    """Building and JSON-serializing the /status response for 8 extruders"""
+    plugin = pipeline_plugin(8)
+    try:
+        for _ in range(10):
+            plugin._check_sensors()
+
+        def run(iterations):
+            for _ in range(iterations):
+                json.dumps(plugin._get_status())
+
+        return run_timed(run, rounds=20, iterations=100)
+    finally:
+        plugin._cleanup_hardware()
+
+def bench_gcode_hook():
+    """G-code sent hook per line, with extrusion tracking on a typical sliced stream"""
+    plugin = pipeline_plugin(2, extrusion_tracking_enabled=True)
+    plugin._cleanup_hardware()
+
+    lines = []
+    for index in range(1000):
+        if index % 250 == 0:
+            lines.append((f"T{index // 250 % 2}", "T"))
+        elif index % 50 == 0:
+            lines.append(("M117 Layer %d" % index, "M117"))
+        elif index % 10 == 0:
+            lines.append(("G0 X%.3f Y%.3f F9000" % (index * 0.1, index * 0.2), "G0"))
+        else:
+            lines.append(("G1 X%.3f Y%.3f E%.5f" % (index * 0.1, index * 0.2, 0.03), "G1"))
+
+    def run(iterations):
+        process_gcode = plugin.process_gcode
+        for _ in range(iterations // len(lines)):
+            for cmd, gcode in lines:
+                process_gcode(None, "sent", cmd, None, gcode)
+
+    return run_timed(run, rounds=20, iterations=10000)
+
+def bench_edge_to_dispatch(trials=20, spacing=0.1):
+    """Latency from a runout pin edge to its action reaching the dispatcher, with the real monitoring loop"""
+    from octoprint_mcp2221_filament_sensor.mcp2221_filament_sensor import (
+        ActionDispatcher, MockMCP2221A, Scenario
+    )
+
+    # No runout filter time, so the latency is that of the pipeline rather than the filter
+    plugin = pipeline_plugin(1, e0_debounce_time=0.0)
+    dispatched = queue.Queue()
+    plugin.action_dispatcher = ActionDispatcher(lambda event, extruder_idx: dispatched.put(time.monotonic()))
+
+    # Filament drops out briefly once per trial. The edges are spread with seeded jitter
+    # so they land at different phases of the poll interval instead of locking to it.
+    scenario = Scenario(seed=trials)
+    lead_in = 0.2
+    edges = [lead_in + trial * spacing + scenario.random.uniform(0.0, spacing / 2) for trial in range(trials)]
+    for edge in edges:
+        scenario.set_pin(edge, 0, False).set_pin(edge + spacing / 4, 0, True)
+
+    device = plugin.devices[0]
+    device.mcp = MockMCP2221A(usbserial=device.label, scenario=scenario)
+    epoch = device.mcp.epoch
+
+    samples = []
+    plugin._start_monitoring()
+    try:
+        for edge in edges:
+            try:
+                dispatched_at = dispatched.get(timeout=spacing * 5)
+            except queue.Empty:
+                raise RuntimeError(f"no dispatch for the edge at {edge:.2f}s")
+            samples.append(dispatched_at - (epoch + edge))
+            with plugin.monitor_lock:
+                plugin.sensors.set_triggered(0, False)
+    finally:
+        plugin._stop_monitoring()
+        plugin.action_dispatcher.stop()
+        plugin._cleanup_hardware()
+
+    return summarize(samples, len(samples), 1)
+
+BENCHMARKS = [
+    ("sensor_state_update", bench_sensor_state_update),
+    ("check_sensors[2]", lambda: bench_check_sensors(2)),
+    ("check_sensors[4]", lambda: bench_check_sensors(4)),
+    ("check_sensors[6]", lambda: bench_check_sensors(6)),
+    ("check_sensors[8]", lambda: bench_check_sensors(8)),
+    ("evaluate_samples[2]", lambda: bench_evaluate_samples(2)),
+    ("evaluate_samples[8]", lambda: bench_evaluate_samples(8)),
+    ("burst_drain[2]", lambda: bench_burst_drain(2)),
+    ("burst_drain[8]", lambda: bench_burst_drain(8)),
+    ("burst_drain_shared[2]", lambda: bench_burst_drain(2, shared=True)),
+    ("get_status", bench_get_status),
+    ("gcode_hook", bench_gcode_hook),
+    ("edge_to_dispatch", bench_edge_to_dispatch),
+]
+
+def compare(results, baseline, tolerance):
+    """Names of benchmarks whose median is more than ``tolerance`` slower than the baseline"""
+    reference = {benchmark["name"]: benchmark["stats"] for benchmark in baseline.get("benchmarks", [])}
+    regressions = []
+    for name, stats in results.items():
+        if name not in reference:
+            logger.info(f"  {name}: no baseline")
+            continue
+        ratio = stats["median"] / reference[name]["median"]
+        slower = ratio > 1.0 + tolerance
+        logger.info(f"  {name}: {ratio:.2f}x baseline median{' - REGRESSION' if slower else ''}")
+        if slower:
+            regressions.append(name)
+    return regressions
+
+def main():
+    """Run all benchmarks"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--save", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline JSON file")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed median slowdown, 0.5 = 50%% slower")
+    parser.add_argument("-k", dest="filter", default="", help="only run benchmarks whose name contains this")
+    args = parser.parse_args()
+
+    # Trigger warnings from the runs would drown the report
+    logging.getLogger("octoprint").setLevel(logging.ERROR)
+
+    logger.info("Starting MCP2221A Filament Sensor Plugin Benchmarks...")
+    results = {}
+    for name, bench in BENCHMARKS:
+        if args.filter not in name:
+            continue
+        stats = bench()
+        results[name] = stats
+        logger.info(f"{name:<22} median {stats['median'] * 1e6:10.3f} us  "
+                    f"mean {stats['mean'] * 1e6:10.3f} us  max {stats['max'] * 1e6:10.3f} us  "
+                    f"ops {stats['ops']:,.0f}/s")
+
+    if args.save:
+        # Entries that were not run keep their recorded stats, so -k re-records only what it selects
+        recorded = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                recorded = {benchmark["name"]: benchmark["stats"] for benchmark in json.load(f).get("benchmarks", [])}
+        recorded.update(results)
+        document = {
+            "machine_info": {
+                "machine": platform.machine(),
+                "python_version": platform.python_version(),
+            },
+            "datetime": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "benchmarks": [{"name": name, "stats": recorded[name]} for name, _ in BENCHMARKS if name in recorded],
+        }
+        with open(args.baseline, "w") as f:
+            json.dump(document, f, indent=2)
+            f.write("\n")
+        logger.info(f"✓ Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        logger.info(f"No baseline at {args.baseline}, run with --save to record one")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    logger.info(f"\n=== Compared with baseline ({args.tolerance:.0%} tolerance) ===")
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        logger.error(f"✗ Performance regressions: {', '.join(regressions)}")
+        return 1
+    logger.info("✓ No performance regressions")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
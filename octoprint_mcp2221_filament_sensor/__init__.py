@@ -16,4 +16,5 @@ def __plugin_load__():
     
     __plugin_hooks__ = {
         "octoprint.plugin.softwareupdate.check_config": __plugin_implementation__.get_update_information,
+        "octoprint.comm.protocol.gcode.sent": __plugin_implementation__.process_gcode,
     } 
\ No newline at end of file
@@ -1,16 +1,31 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, unicode_literals
 
+import math
+import array
+import bisect
+import heapq
+import mmap
+import multiprocessing
+import os
+import random
+import re
+import struct
+import sys
 import time
 import threading
 import logging
 from collections import deque
-from typing import Optional, Dict, Any, List
+from itertools import compress
+from types import MappingProxyType
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, Callable, List, Iterable, Mapping
 
 import octoprint.plugin
 import octoprint.printer
 import octoprint.filemanager
 import flask
+from octoprint.access.permissions import Permissions
 from octoprint.events import Events
 
 try:
@@ -20,113 +35,2564 @@ try:
 except ImportError:
     MCP2221A_AVAILABLE = False
 
+try:
+    from multiprocessing import shared_memory
+
+    SHARED_MEMORY_AVAILABLE = True
+except ImportError:  # Python 3.7
+    SHARED_MEMORY_AVAILABLE = False
+
+# GP1 is the only MCP2221A pin with an interrupt-on-change (IOC) function
+IOC_PIN = 1
+
+# Poll interval while printing with motion sensors that are not latched in hardware
+FAST_POLL_INTERVAL = 0.005
+
+# Shortest configurable loop period (poll interval, burst window)
+MIN_POLL_INTERVAL = 0.001
+
+# Upper bound on configurable tools (extruders), e.g. for toolchangers
+MAX_EXTRUDERS = 8
+
+# OctoPrint's parsed command codes that select a tool, and the tool number in such a line
+TOOL_CHANGE_CODES = frozenset(("T", "M6", "M06"))
+TOOL_NUMBER_RE = re.compile(r"\s*(?:M0?6\s+(?:[^\s;]+\s+)*?)?T(\d+)")
+
+# Parsed command codes that move or reposition the extruder, or switch between absolute and relative E
+EXTRUSION_CODES = frozenset(("G0", "G1", "G2", "G3", "G92", "G90", "G91", "M82", "M83"))
+
+# Trigger events, their G-code template settings and display labels
+TRIGGER_EVENTS = {
+    "runout": ("runout_gcode", "Filament runout"),
+    "motion_timeout": ("motion_timeout_gcode", "Motion timeout"),
+    "jam": ("motion_timeout_gcode", "Filament jam"),  # Runs the motion timeout actions
+}
+
+# Hook other plugins implement to add @actions, returning {name: handler(extruder, event, args)}
+ACTION_HOOK = "octoprint.plugin.mcp2221_filament_sensor.actions"
+
+
+class SimulatedClock:
+    """Virtual monotonic clock, advanced explicitly so simulations run faster than real time"""
+
+    def __init__(self, start: float = 0.0):
+        self.now = start
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+class Scenario:
+    """Deterministic GPIO waveforms for the simulated MCP2221A.
+
+    Each pin is a sorted list of ``(time, level)`` transitions, so the
+    simulated bridge answers by time rather than by how often it is read.
+    Contact bounce and pulse jitter come from a seeded generator. Latency
+    windows delay reads and disconnect windows make them fail. A looping
+    scenario repeats after its last event.
+    """
+
+    def __init__(self, seed: int = 0, initial=(True, False, True, False), loop: bool = False):
+        self.random = random.Random(seed)
+        self.initial = [bool(level) for level in initial]
+        self.times = [[] for _ in range(4)]  # type: List[List[float]]
+        self.levels = [[] for _ in range(4)]  # type: List[List[bool]]
+        self.latencies = []  # type: List[tuple]  # (start, end, delay)
+        self.outages = []  # type: List[tuple]  # (start, end)
+        self.loop = loop
+        self.duration = 0.0
+
+    ##~~ Building
+
+    def set_pin(self, timestamp: float, pin: int, level: bool) -> "Scenario":
+        index = bisect.bisect_right(self.times[pin], timestamp)
+        self.times[pin].insert(index, timestamp)
+        self.levels[pin].insert(index, bool(level))
+        self.duration = max(self.duration, timestamp)
+        return self
+
+    def pulses(self, pin: int, start: float, end: float, period: float, duty: float = 0.5,
+               jitter: float = 0.0) -> "Scenario":
+        """Square wave on ``pin`` between ``start`` and ``end``, optionally with seeded period jitter"""
+        timestamp = start
+        while timestamp < end:
+            self.set_pin(timestamp, pin, True)
+            self.set_pin(min(timestamp + period * duty, end), pin, False)
+            timestamp += period + (self.random.uniform(-jitter, jitter) if jitter else 0.0)
+        return self
+
+    def bounce(self, timestamp: float, pin: int, level: bool, duration: float = 0.005,
+               transitions: int = 4) -> "Scenario":
+        """Switch ``pin`` to ``level`` with contact chatter settling after ``duration``"""
+        self.set_pin(timestamp, pin, level)
+        chatter = sorted(self.random.uniform(timestamp, timestamp + duration) for _ in range(transitions))
+        for count, chatter_time in enumerate(chatter):
+            self.set_pin(chatter_time, pin, level if count % 2 else not level)
+        return self.set_pin(timestamp + duration, pin, level)
+
+    def latency(self, start: float, end: float, delay: float) -> "Scenario":
+        self.latencies.append((start, end, delay))
+        self.duration = max(self.duration, end)
+        return self
+
+    def disconnect(self, start: float, end: float) -> "Scenario":
+        self.outages.append((start, end))
+        self.duration = max(self.duration, end)
+        return self
+
+    @classmethod
+    def demo(cls, seed: int = 0) -> "Scenario":
+        """Endless demo: filament present on GP0/GP2 and steady motion pulses on GP1/GP3"""
+        scenario = cls(seed=seed, loop=True)
+        scenario.pulses(1, 0.0, 600.0, period=1.2)
+        scenario.pulses(3, 0.6, 600.0, period=1.2)
+        return scenario
+
+    @classmethod
+    def from_trace(cls, rows, seed: int = 0) -> "Scenario":
+        """Scenario from raw ``(time, pin, level)`` rows, timed relative to the first row"""
+        rows = sorted(rows)
+        scenario = cls(seed=seed)
+        if rows:
+            origin = rows[0][0]
+            for timestamp, pin, level in rows:
+                scenario.set_pin(timestamp - origin, pin, level)
+        return scenario
+
+    @classmethod
+    def from_journal(cls, records: List[Dict[str, Any]], inverted_pins=()) -> "Scenario":
+        """Scenario from ``EventJournal.query()`` records captured on a printer.
+
+        The journal holds debounced, inversion-applied states; pins listed in
+        ``inverted_pins`` are flipped back to raw levels. Bridge disconnects
+        become disconnect windows.
+        """
+        scenario = cls()
+        if not records:
+            return scenario
+
+        origin = records[0]["time"]
+        seen = set()
+        down_since = None
+        for record in records:
+            timestamp = record["time"] - origin
+            event = record["event"]
+            if event in ("runout_state", "motion_state") and 0 <= record["pin"] < 4:
+                pin = record["pin"]
+                level = bool(record["value"]) != (pin in inverted_pins)
+                if pin not in seen:
+                    seen.add(pin)
+                    scenario.initial[pin] = level
+                scenario.set_pin(timestamp, pin, level)
+            elif event == "device_down" and down_since is None:
+                down_since = timestamp
+            elif event == "device_up" and down_since is not None:
+                scenario.disconnect(down_since, timestamp)
+                down_since = None
+
+        scenario.duration = max(scenario.duration, records[-1]["time"] - origin)
+        return scenario
+
+    ##~~ Playback
+
+    def _wrap(self, timestamp: float) -> float:
+        return timestamp % self.duration if self.loop and self.duration else timestamp
+
+    def level_at(self, pin: int, timestamp: float) -> bool:
+        index = bisect.bisect_right(self.times[pin], self._wrap(timestamp))
+        return self.levels[pin][index - 1] if index else self.initial[pin]
+
+    def edges_between(self, pin: int, start: float, end: float) -> tuple:
+        """(rising, falling): whether ``pin`` had such an edge in ``(start, end]``"""
+        if end <= start:
+            return False, False
+        if self.loop and self.duration and end - start >= self.duration:
+            start, end = 0.0, self.duration
+        wrapped_start, wrapped_end = self._wrap(start), self._wrap(end)
+        if wrapped_start > wrapped_end:
+            first = self.edges_between(pin, wrapped_start, self.duration)
+            second = self.edges_between(pin, 0.0, wrapped_end)
+            return first[0] or second[0], first[1] or second[1]
+
+        times, levels = self.times[pin], self.levels[pin]
+        rising = falling = False
+        previous = self.level_at(pin, wrapped_start)
+        for index in range(bisect.bisect_right(times, wrapped_start), bisect.bisect_right(times, wrapped_end)):
+            level = levels[index]
+            if level != previous:
+                if level:
+                    rising = True
+                else:
+                    falling = True
+                previous = level
+        return rising, falling
+
+    def read_delay(self, timestamp: float) -> float:
+        timestamp = self._wrap(timestamp)
+        return sum(delay for start, end, delay in self.latencies if start <= timestamp < end)
+
+    def disconnected(self, timestamp: float) -> bool:
+        timestamp = self._wrap(timestamp)
+        return any(start <= timestamp < end for start, end in self.outages)
+
 
 class MockMCP2221A:
-    """Mock MCP2221A for testing without hardware"""
+    """Mock MCP2221A for testing without hardware.
 
-    def __init__(self):
-        self._pins = {0: False, 1: False, 2: False, 3: False}
-        self._last_values = {0: False, 1: False, 2: False, 3: False}
+    Pin levels come from a ``Scenario`` evaluated at the time of each read,
+    by default an endless demo on the real monotonic clock. Pass a scenario
+    and a ``SimulatedClock`` for reproducible runs faster than real time.
+    """
+
+    def __init__(self, usbserial: Optional[str] = None, read_delay: float = 0.0,
+                 scenario: Optional[Scenario] = None, clock=None, epoch: Optional[float] = None):
+        self.usbserial = usbserial  # Distinguishes several mock bridges
+        self.read_delay = read_delay  # Simulated USB latency per GPIO_read
+        self.scenario = scenario if scenario is not None else Scenario.demo()
+        self.clock = clock or time.monotonic
+        self.epoch = self.clock() if epoch is None else epoch  # Clock time of scenario time 0
+        self._pin_functions = {0: "GPIO_IN", 1: "GPIO_IN", 2: "GPIO_IN", 3: "GPIO_IN"}
         self.is_connected = True
-        self._runout_triggered = {0: False, 2: False}  # Track if runout already triggered
-        self._motion_counter = 0
+        self._last_read = self.clock() - self.epoch
+
+        # Interrupt-on-change latch on GP1
+        self._ioc_edge = "none"
+        self._ioc_flag = False
+        self.ioc_edges_latched = 0  # Total edges that set the latch, for tests
+
+    def _sleep(self, seconds: float):
+        advance = getattr(self.clock, "advance", None)
+        if advance is not None:
+            advance(seconds)
+        else:
+            time.sleep(seconds)
 
     def GPIO_read(self):
         """Simulate GPIO reading - returns tuple (gp0, gp1, gp2, gp3) to match EasyMCP2221 API"""
-        import random
-
-        # Make mock sensors much less aggressive - only trigger occasionally for testing
-        # GP0 (E0 runout sensor) - much lower chance of false runouts
-        if not self._runout_triggered[0] and random.random() > 0.9999:  # 0.01% chance
-            self._runout_triggered[0] = True
-        elif self._runout_triggered[0] and random.random() > 0.95:  # 5% chance to clear
-            self._runout_triggered[0] = False
-        gp0 = not self._runout_triggered[0]  # True = filament present
-
-        # GP1 (E0 motion sensor) - simulate more realistic motion
-        self._motion_counter += 1
-        gp1 = (self._motion_counter % 20) < 10  # Regular pulse pattern
-
-        # GP2 (E1 runout sensor) - much lower chance of false runouts
-        if not self._runout_triggered[2] and random.random() > 0.9999:  # 0.01% chance
-            self._runout_triggered[2] = True
-        elif self._runout_triggered[2] and random.random() > 0.95:  # 5% chance to clear
-            self._runout_triggered[2] = False
-        gp2 = not self._runout_triggered[2]  # True = filament present
-
-        # GP3 (E1 motion sensor) - simulate more realistic motion
-        gp3 = (
-            (self._motion_counter + 10) % 20
-        ) < 10  # Regular pulse pattern, offset from GP1
-
-        return (gp0, gp1, gp2, gp3)
+        scenario = self.scenario
+        delay = self.read_delay + scenario.read_delay(self.clock() - self.epoch)
+        if delay:
+            self._sleep(delay)
+
+        now = self.clock() - self.epoch
+        if scenario.disconnected(now):
+            raise OSError(f"MCP2221A {self.usbserial or ''} not responding (simulated disconnect)")
+
+        levels = [scenario.level_at(pin, now) for pin in range(4)]
+
+        # In IOC mode GP1 is latched in "hardware", catching edges between reads, and not readable as a GPIO
+        if self._pin_functions[IOC_PIN] == "IOC":
+            rising, falling = scenario.edges_between(IOC_PIN, self._last_read, now)
+            if rising:
+                self.simulate_edge(rising=True)
+            if falling:
+                self.simulate_edge(rising=False)
+            levels[IOC_PIN] = None
+
+        self._last_read = now
+        return tuple(levels)
+
+    def reopen(self) -> "MockMCP2221A":
+        """A fresh handle on the same simulated bridge, failing while it is disconnected"""
+        if self.scenario.disconnected(self.clock() - self.epoch):
+            raise OSError(f"MCP2221A {self.usbserial or ''} not found (simulated disconnect)")
+        return MockMCP2221A(usbserial=self.usbserial, read_delay=self.read_delay, scenario=self.scenario,
+                            clock=self.clock, epoch=self.epoch)
 
     def set_pin_function(self, **kwargs):
         """Mock pin configuration - accepts gp0, gp1, gp2, gp3 kwargs"""
-        pass
+        for pin in range(4):
+            function = kwargs.get(f"gp{pin}")
+            if function is not None:
+                self._pin_functions[pin] = function
+
+    def IOC_config(self, edge="both"):
+        """Mock interrupt-on-change edge selection ("none", "raising", "falling" or "both")"""
+        self._ioc_edge = edge
+
+    def IOC_read(self):
+        """Return 1 if an edge has been latched since the last IOC_clear"""
+        return 1 if self._ioc_flag else 0
+
+    def IOC_clear(self):
+        self._ioc_flag = False
+
+    def simulate_edge(self, rising: bool = True):
+        """Latch an edge on GP1 as the hardware would, honouring the configured edge"""
+        if self._ioc_edge == "both" or (self._ioc_edge == "raising" and rising) or \
+                (self._ioc_edge == "falling" and not rising):
+            self._ioc_flag = True
+            self.ioc_edges_latched += 1
 
     def close(self):
         self.is_connected = False
 
 
-class SensorState:
-    """Track individual sensor state and history"""
-    
-    def __init__(self, pin: int, sensor_type: str, inverted: bool = False, debounce_time: float = 0.1):
-        self.pin = pin
-        self.sensor_type = sensor_type  # 'runout' or 'motion'
-        self.inverted = inverted
-        self.debounce_time = debounce_time
-        
-        self.current_state = False
-        self.last_stable_state = False
-        self.last_change_time = 0
-        self.last_trigger_time = 0
-        
-        # Motion-specific tracking
-        if sensor_type == 'motion':
-            self.motion_history = deque(maxlen=100)  # Keep last 100 readings
-            self.last_motion_time = time.time()
-            
-    def update(self, raw_value: bool) -> bool:
-        """Update sensor state with debouncing. Returns True if state changed."""
-        current_time = time.time()
-        processed_value = not raw_value if self.inverted else raw_value
-        
-        # Debounce logic
-        if processed_value != self.current_state:
-            if current_time - self.last_change_time > self.debounce_time:
-                old_state = self.last_stable_state
-                self.last_stable_state = processed_value
-                self.last_change_time = current_time
-                
-                # Track motion pulses
-                if self.sensor_type == 'motion' and processed_value:
-                    self.motion_history.append(current_time)
-                    self.last_motion_time = current_time
-                    
-                return old_state != self.last_stable_state
-                
-        self.current_state = processed_value
+class _ReplayPrinter:
+    """Printer stand-in during a replay, reporting the simulated print state and ignoring commands"""
+
+    def __init__(self, printing: bool):
+        self.printing = printing
+
+    def is_printing(self) -> bool:
+        return self.printing
+
+    def commands(self, commands, **kwargs):
+        pass
+
+
+class _ReplayRecorder:
+    """Dispatcher stand-in during a replay, recording triggers against the simulated clock"""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.start = clock()
+        self.triggers = []  # type: List[Dict[str, Any]]
+
+    def submit(self, event: str, extruder_idx: int, current_time: Optional[float] = None) -> bool:
+        self.triggers.append({"time": self.clock() - self.start, "event": event, "extruder": extruder_idx})
+        return True
+
+
+class MotionRateEstimator:
+    """Rolling pulse-rate estimator over several windows at once.
+
+    Pulses are counted into fixed-width time buckets held in a ring, and a
+    running total is kept per window, so recording a pulse and reading a
+    rate are constant time and allocate nothing. Reads do not modify state,
+    so the API thread can query rates while the sampling thread records.
+    An exponentially weighted rate is kept alongside the windowed ones.
+    """
+
+    def __init__(self, windows=(1.0, 10.0, 60.0), bucket_width: float = 0.1, ewma_tau: float = 5.0,
+                 clock=time.monotonic):
+        self.windows = tuple(windows)
+        self.bucket_width = bucket_width
+        self.ewma_tau = ewma_tau
+        self.clock = clock  # Time source for reads without an explicit time
+
+        self._window_buckets = {window: int(round(window / bucket_width)) for window in self.windows}
+        self._size = max(self._window_buckets.values()) + 1
+        self._buckets = [0] * self._size
+        self._sums = {window: 0 for window in self.windows}
+        self._current = None  # Absolute index of the newest bucket
+
+        self._ewma = 0.0
+        self._ewma_time = None
+
+    def _bucket_index(self, timestamp: float) -> int:
+        return int(timestamp // self.bucket_width)
+
+    def _advance(self, index: int):
+        """Move the newest bucket forward to ``index``, expiring old counts from each window"""
+        if self._current is None or index - self._current >= self._size:
+            for i in range(self._size):
+                self._buckets[i] = 0
+            for window in self.windows:
+                self._sums[window] = 0
+            self._current = index
+            return
+
+        while self._current < index:
+            self._current += 1
+            for window, n in self._window_buckets.items():
+                self._sums[window] -= self._buckets[(self._current - n) % self._size]
+            self._buckets[self._current % self._size] = 0
+
+    def record(self, timestamp: float, count: int = 1):
+        """Record ``count`` pulses at ``timestamp`` (monotonic seconds)"""
+        index = self._bucket_index(timestamp)
+        if self._current is None or index > self._current:
+            self._advance(index)
+        self._buckets[self._current % self._size] += count
+        for window in self.windows:
+            self._sums[window] += count
+
+        if self._ewma_time is not None:
+            self._ewma *= math.exp(-(timestamp - self._ewma_time) / self.ewma_tau)
+        self._ewma += count / self.ewma_tau
+        self._ewma_time = timestamp
+
+    def get_rate(self, window: float, current_time: Optional[float] = None) -> float:
+        """Get pulses per second over ``window`` seconds.
+
+        Configured windows are read from their running totals. Other windows
+        up to the largest one are summed from the buckets they cover, longer
+        ones fall back to the largest window.
+        """
+        if self._current is None:
+            return 0.0
+        if current_time is None:
+            current_time = self.clock()
+
+        n = self._window_buckets.get(window)
+        if n is None:
+            n = min(max(int(round(window / self.bucket_width)), 1), self._size - 1)
+        stale = self._bucket_index(current_time) - self._current
+        if stale >= n:
+            return 0.0
+
+        if window in self._sums:
+            # Discount buckets that have aged out since the last recorded pulse
+            total = self._sums[window]
+            for offset in range(stale):
+                total -= self._buckets[(self._current - n + 1 + offset) % self._size]
+            return total / window
+
+        total = 0
+        for offset in range(n - stale):
+            total += self._buckets[(self._current - offset) % self._size]
+        return total / (n * self.bucket_width)
+
+    def get_ewma_rate(self, current_time: Optional[float] = None) -> float:
+        """Get the exponentially weighted pulse rate (pulses per second)"""
+        if self._ewma_time is None:
+            return 0.0
+        if current_time is None:
+            current_time = self.clock()
+        return self._ewma * math.exp(-max(current_time - self._ewma_time, 0.0) / self.ewma_tau)
+
+
+class PulseIntervalStats:
+    """Streaming statistics of the intervals between motion pulses.
+
+    Welford's algorithm keeps the mean and variance over every interval, an
+    exponentially weighted mean and variance follow recent behaviour, and a
+    fixed-bucket histogram keeps the distribution. Each pulse updates them in
+    O(1) without storing intervals. Intervals longer than ``max_interval``
+    are pauses rather than feeding and are only counted as gaps.
+    """
+
+    __slots__ = ("max_interval", "alpha", "last_pulse", "count", "mean", "m2",
+                 "recent_mean", "recent_variance", "gaps", "histogram")
+
+    BOUNDS = (0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0, 10.0)  # Interval histogram bucket upper bounds, seconds
+    BUCKET_LABELS = tuple(f"<={bound:g}s" for bound in BOUNDS) + (f">{BOUNDS[-1]:g}s",)
+
+    def __init__(self, max_interval: float = 30.0, alpha: float = 0.1):
+        self.max_interval = max_interval
+        self.alpha = alpha  # Weight of the newest interval in the recent mean and variance
+        self.last_pulse = None  # type: Optional[float]
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0  # Sum of squared deviations from the mean
+        self.recent_mean = 0.0
+        self.recent_variance = 0.0
+        self.gaps = 0
+        self.histogram = Histogram(self.BOUNDS)
+
+    def record(self, timestamp: float):
+        """Record a pulse at ``timestamp`` (monotonic seconds)"""
+        last_pulse = self.last_pulse
+        self.last_pulse = timestamp
+        if last_pulse is None:
+            return
+        interval = timestamp - last_pulse
+        if interval <= 0.0:
+            return
+        if interval > self.max_interval:
+            self.gaps += 1
+            return
+
+        self.histogram.observe(interval)
+        self.count += 1
+        delta = interval - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (interval - self.mean)
+
+        if self.count == 1:
+            self.recent_mean = interval
+            self.recent_variance = 0.0
+        else:
+            delta = interval - self.recent_mean
+            increment = self.alpha * delta
+            self.recent_mean += increment
+            self.recent_variance = (1.0 - self.alpha) * (self.recent_variance + delta * increment)
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def recent_cv(self) -> float:
+        """Coefficient of variation of recent intervals; rises as a partial clog makes feeding irregular"""
+        return math.sqrt(self.recent_variance) / self.recent_mean if self.recent_mean else 0.0
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean_s": round(self.mean, 4),
+            "stddev_s": round(math.sqrt(self.variance), 4),
+            "recent_mean_s": round(self.recent_mean, 4),
+            "recent_stddev_s": round(math.sqrt(self.recent_variance), 4),
+            "recent_cv": round(self.recent_cv, 3),
+            "gaps": self.gaps,
+            "histogram": dict(zip(self.BUCKET_LABELS, self.histogram.counts)),
+        }
+
+
+class IntegratingFilter:
+    """Integrating (majority-vote) filter for slow, noisy levels such as runout switches.
+
+    An integrator moves towards the sampled level by the time elapsed since
+    the previous sample and is clamped to ``[0, integration_time]``. The
+    stable state only flips when the integrator reaches the opposite rail,
+    so the new level has to dominate for ``integration_time`` regardless of
+    the poll rate. An excursion that falls back without flipping is counted
+    as a glitch.
+    """
+
+    KIND = "integrating"
+    TRACKS_ELAPSED = True  # Integrates the time between samples, so skipped samples must be resumed
+
+    __slots__ = ("width", "level", "state", "edge_time", "last_time", "excursion", "glitches", "transitions")
+
+    def __init__(self, width: float):
+        self.width = max(width, 0.0)  # Integration time, seconds
+        self.level = 0.0
+        self.state = False
+        self.edge_time = 0.0  # Time the stable state last flipped
+        self.last_time = None  # type: Optional[float]
+        self.excursion = False
+        self.glitches = 0
+        self.transitions = 0
+
+    def update(self, value: bool, timestamp: float) -> bool:
+        """Feed one sample. Returns True if the stable state changed."""
+        last_time = self.last_time
+        self.last_time = timestamp
+        if last_time is None:
+            # The first sample primes the filter
+            self.level = self.width if value else 0.0
+            return self._flip(value, timestamp) if value != self.state else False
+
+        elapsed = timestamp - last_time if timestamp > last_time else 0.0
+        if value:
+            self.level = min(self.level + elapsed, self.width)
+        else:
+            self.level = max(self.level - elapsed, 0.0)
+
+        if value != self.state:
+            if (self.level >= self.width) if value else (self.level <= 0.0):
+                return self._flip(value, timestamp)
+            self.excursion = True
+        elif self.excursion and self.level == (self.width if value else 0.0):
+            self.excursion = False
+            self.glitches += 1
+        return False
+
+    @property
+    def settled(self) -> bool:
+        """True while the integrator rests on the rail of the stable state, so a matching sample changes nothing"""
+        return self.last_time is not None and not self.excursion and \
+            self.level == (self.width if self.state else 0.0)
+
+    def resume(self, previous_time: float):
+        """Account for matching samples that batch evaluation skipped while the filter was settled"""
+        if self.last_time is not None and previous_time > self.last_time:
+            self.last_time = previous_time
+
+    def _flip(self, value: bool, timestamp: float) -> bool:
+        self.state = value
+        self.edge_time = timestamp
+        self.excursion = False
+        self.transitions += 1
+        return True
+
+
+class PulseWidthFilter:
+    """Minimum pulse width filter for fast pulse trains such as motion encoders.
+
+    A new level is accepted once it has been seen for at least ``width``
+    seconds, timestamped from its first sample, so pulses survive at any
+    feed rate where each level lasts longer than the filter width. A level
+    that reverts sooner is rejected and counted as a glitch.
+    """
+
+    KIND = "pulse_width"
+    TRACKS_ELAPSED = False
+
+    __slots__ = ("width", "state", "edge_time", "candidate_since", "primed", "glitches", "transitions")
+
+    def __init__(self, width: float):
+        self.width = max(width, 0.0)  # Minimum pulse width, seconds
+        self.state = False
+        self.edge_time = 0.0  # Time the accepted level was first seen
+        self.candidate_since = None  # type: Optional[float]  # First sample of an unconfirmed new level
+        self.primed = False
+        self.glitches = 0
+        self.transitions = 0
+
+    def update(self, value: bool, timestamp: float) -> bool:
+        """Feed one sample. Returns True if the stable state changed."""
+        if value == self.state:
+            if self.candidate_since is not None:
+                self.candidate_since = None
+                self.glitches += 1
+            self.primed = True
+            return False
+
+        if self.candidate_since is None:
+            self.candidate_since = timestamp
+        if self.primed and timestamp - self.candidate_since < self.width:
+            return False
+
+        # The first sample primes the filter
+        self.primed = True
+        self.state = value
+        self.edge_time = self.candidate_since
+        self.candidate_since = None
+        self.transitions += 1
+        return True
+
+    @property
+    def settled(self) -> bool:
+        return self.primed and self.candidate_since is None
+
+    def resume(self, previous_time: float):
+        pass
+
+
+SENSOR_FILTERS = {
+    IntegratingFilter.KIND: IntegratingFilter,
+    PulseWidthFilter.KIND: PulseWidthFilter,
+}
+DEFAULT_SENSOR_FILTERS = {"runout": IntegratingFilter.KIND, "motion": PulseWidthFilter.KIND}
+
+
+def get_filter_stats(signal_filter) -> Dict[str, Any]:
+    """Glitch statistics of a sensor filter; the rejection rate is glitches per level change seen"""
+    seen = signal_filter.glitches + signal_filter.transitions
+    return {
+        "kind": signal_filter.KIND,
+        "width": signal_filter.width,
+        "glitches": signal_filter.glitches,
+        "transitions": signal_filter.transitions,
+        "rejection_rate": round(signal_filter.glitches / seen, 4) if seen else 0.0,
+    }
+
+
+class SensorState:
+    """Track individual sensor state and history"""
+
+    __slots__ = (
+        "pin", "sensor_type", "inverted", "debounce_time", "filter",
+        "current_state", "last_stable_state", "last_change_time", "last_trigger_time",
+        "last_motion_time", "pulse_count", "rate_estimator", "interval_stats", "mm_per_pulse",
+    )
+    
+    def __init__(self, pin: int, sensor_type: str, inverted: bool = False, debounce_time: float = 0.1,
+                 mm_per_pulse: float = 0.0, filter_kind: Optional[str] = None, clock=time.monotonic):
+        self.pin = pin
+        self.sensor_type = sensor_type  # 'runout' or 'motion'
+        self.inverted = inverted
+        self.debounce_time = debounce_time  # Width of the filter
+        self.filter = SENSOR_FILTERS[filter_kind or DEFAULT_SENSOR_FILTERS[sensor_type]](debounce_time)
+        
+        self.current_state = False
+        self.last_stable_state = False
+        self.last_change_time = 0
+        self.last_trigger_time = 0
+        
+        # Motion-specific tracking
+        if sensor_type == 'motion':
+            self.last_motion_time = time.monotonic()
+            self.pulse_count = 0
+            self.rate_estimator = MotionRateEstimator(clock=clock)
+            self.interval_stats = PulseIntervalStats()
+            self.mm_per_pulse = mm_per_pulse  # Filament length per recorded pulse, 0 if unknown
+            
+    def update(self, raw_value: bool, current_time: Optional[float] = None) -> bool:
+        """Feed a reading through the sensor's filter. Returns True if the stable state changed.
+
+        ``current_time`` is the timestamp of the GPIO snapshot the value came
+        from, so that every sensor fed from one read shares the same instant.
+        """
+        if current_time is None:
+            current_time = time.monotonic()
+        processed_value = not raw_value if self.inverted else raw_value
+        self.current_state = processed_value
+
+        signal_filter = self.filter
+        if not signal_filter.update(processed_value, current_time):
+            return False
+
+        self.last_stable_state = processed_value
+        edge_time = signal_filter.edge_time
+        self.last_change_time = edge_time
+
+        # Track motion pulses
+        if self.sensor_type == 'motion' and processed_value:
+            self.last_motion_time = edge_time
+            self.pulse_count += 1
+            self.rate_estimator.record(edge_time)
+            self.interval_stats.record(edge_time)
+        return True
+
+    def record_pulse(self, current_time: Optional[float] = None) -> bool:
+        """Record a motion pulse latched by the hardware interrupt-on-change flag.
+
+        The edge has already been filtered in hardware, so no debouncing is
+        applied. Returns True so callers can treat it like a state change.
+        """
+        if current_time is None:
+            current_time = time.monotonic()
+        self.last_motion_time = current_time
+        self.pulse_count += 1
+        self.rate_estimator.record(current_time)
+        self.interval_stats.record(current_time)
+        return True
+        
+    def get_motion_timeout_status(self, timeout_seconds: float, current_time: Optional[float] = None) -> bool:
+        """Check if motion has timed out"""
+        if self.sensor_type != 'motion':
+            return False
+        if current_time is None:
+            current_time = time.monotonic()
+        return (current_time - self.last_motion_time) > timeout_seconds
+        
+    def get_motion_rate(self, window_seconds: float = 10.0, current_time: Optional[float] = None) -> float:
+        """Get motion rate (pulses per second) over the specified window"""
+        if self.sensor_type != 'motion':
+            return 0.0
+        return self.rate_estimator.get_rate(window_seconds, current_time)
+
+    def get_motion_rates(self, current_time: Optional[float] = None) -> Dict[str, float]:
+        """Get motion rates for every tracked window plus the exponentially weighted rate"""
+        if self.sensor_type != 'motion':
+            return {}
+
+        if current_time is None:
+            current_time = self.rate_estimator.clock()
+        rates = {
+            f"{window:g}s": round(self.rate_estimator.get_rate(window, current_time), 2)
+            for window in self.rate_estimator.windows
+        }
+        rates["ewma"] = round(self.rate_estimator.get_ewma_rate(current_time), 2)
+        return rates
+
+    def get_feed_rate(self, current_time: Optional[float] = None) -> float:
+        """Estimated filament feed rate in mm/s from the recent mean pulse interval.
+
+        While no pulse arrives the time since the last one stands in for the
+        interval, so the estimate decays towards zero when feeding stops.
+        """
+        if self.sensor_type != 'motion' or not self.mm_per_pulse:
+            return 0.0
+        stats = self.interval_stats
+        if not stats.count:
+            return 0.0
+        if current_time is None:
+            current_time = time.monotonic()
+        since_pulse = current_time - stats.last_pulse
+        if since_pulse > stats.max_interval:
+            return 0.0
+        return self.mm_per_pulse / max(stats.recent_mean, since_pulse)
+
+
+class SensorBank:
+    """Flat, slot-indexed sensor state for every enabled extruder.
+
+    Each enabled extruder occupies one slot across parallel columns, so the
+    monitoring loop makes a single pass over plain lists regardless of how
+    many tools are configured. ``index`` maps extruder numbers to slots for
+    callers outside the hot loop.
+
+    For batch evaluation every sensor also owns one bit of a combined pin
+    mask, bit ``PINS_PER_DEVICE * device + pin``. ``expected`` holds the raw
+    level each settled sensor's filter is resting on, so XOR-ing a snapshot
+    against it yields the only sensors that need their filter run. Sensors
+    with a filter still in transition are kept in ``unsettled``, and pins
+    shared by several sensors are always evaluated.
+    """
+
+    PINS_PER_DEVICE = 4
+
+    __slots__ = ("extruders", "devices", "runout", "motion", "motion_timeouts", "jam_lengths",
+                 "extruded_at_pulse", "triggered", "index",
+                 "bit_sensors", "expected", "watch", "always", "unsettled", "resumable", "jam_slots",
+                 "deadlines_dirty", "earliest_deadline", "last_sample_time",
+                 "history_second", "second_ends", "wall_offset", "read_samples", "device_masks",
+                 "present_samples", "present_mark")
+
+    def __init__(self):
+        self.extruders = []  # type: List[int]
+        self.devices = []  # type: List[int]
+        self.runout = []  # type: List[SensorState]
+        self.motion = []  # type: List[SensorState]
+        self.motion_timeouts = []  # type: List[float]
+        self.jam_lengths = []  # type: List[float]  # Commanded mm without a pulse that means a jam, 0 = off
+        self.extruded_at_pulse = []  # type: List[float]  # Commanded total at the last motion pulse
+        self.triggered = []  # type: List[bool]
+        self.index = {}  # type: Dict[int, int]
+
+        # Batch evaluation; a sensor entry is (slot, sensor, bit)
+        self.bit_sensors = {}  # type: Dict[int, List[tuple]]
+        self.expected = 0  # Raw level of each settled sensor's stable state
+        self.watch = 0  # Bits of settled sensors, compared against ``expected``
+        self.always = 0  # Pins shared by several sensors, evaluated every sample
+        self.unsettled = {}  # type: Dict[tuple, None]  # Ordered set of entries with a filter in transition
+        self.resumable = 0  # Bits of sensors whose filter has to resume after skipped samples
+        self.jam_slots = []  # type: List[int]
+        self.deadlines_dirty = True
+        self.earliest_deadline = math.inf  # Earliest motion timeout of any slot
+        self.last_sample_time = 0.0
+
+        # History samples are counted per set of bridges read and per runout state run, then flushed once a second
+        self.history_second = None  # type: Optional[int]
+        self.second_ends = -math.inf  # Monotonic time at which the current wall-clock second ends
+        self.wall_offset = 0.0  # time.time() - monotonic time, refreshed every second
+        self.read_samples = {}  # type: Dict[int, int]  # Pin bits read -> samples this second
+        self.device_masks = []  # type: List[int]  # Pin bits of each bridge
+        self.present_samples = []  # type: List[int]
+        self.present_mark = []  # type: List[int]
+
+    def __len__(self):
+        return len(self.extruders)
+
+    def add(self, extruder_idx: int, runout: SensorState, motion: SensorState, motion_timeout: float,
+            device: int = 0, jam_length: float = 0.0):
+        self.index[extruder_idx] = len(self.extruders)
+        self.extruders.append(extruder_idx)
+        self.devices.append(device)
+        self.runout.append(runout)
+        self.motion.append(motion)
+        self.motion_timeouts.append(motion_timeout)
+        self.jam_lengths.append(jam_length)
+        self.extruded_at_pulse.append(0.0)
+        self.triggered.append(False)
+
+        slot = self.index[extruder_idx]
+        if jam_length:
+            self.jam_slots.append(slot)
+        while len(self.device_masks) <= device:
+            self.device_masks.append(self.device_bits(len(self.device_masks)))
+        self.present_samples.append(0)
+        self.present_mark.append(0)
+        for sensor in (runout, motion):
+            bit = 1 << (self.PINS_PER_DEVICE * device + sensor.pin)
+            entries = self.bit_sensors.setdefault(bit, [])
+            entries.append((slot, sensor, bit))
+            if sensor.filter.TRACKS_ELAPSED:
+                self.resumable |= bit
+            if len(entries) > 1:
+                self.always |= bit
+                self.watch &= ~bit
+                for entry in entries:
+                    self.unsettled.pop(entry, None)
+            else:
+                self.unsettled[entries[0]] = None
+        self.deadlines_dirty = True
+
+    def device_bits(self, device: int) -> int:
+        return ((1 << self.PINS_PER_DEVICE) - 1) << (self.PINS_PER_DEVICE * device)
+
+    def device_samples(self, device: int) -> int:
+        """Samples this second that read the bridge"""
+        device_mask = self.device_masks[device]
+        return sum(count for read, count in self.read_samples.items() if read & device_mask)
+
+    def changed_entries(self, mask: int, scope: int) -> List[tuple]:
+        """Sensors whose filter has to see a sample: unsettled ones and those whose pin left its expected level"""
+        diff = (((mask ^ self.expected) & self.watch) | self.always) & scope
+        if not self.unsettled:
+            if not diff:
+                return []
+            entries = []
+        else:
+            entries = [entry for entry in self.unsettled if entry[2] & scope]
+        bit_sensors = self.bit_sensors
+        while diff:
+            bit = diff & -diff
+            entries.extend(bit_sensors[bit])
+            diff ^= bit
+        return entries
+
+    def refresh(self, entry: tuple):
+        """Re-file a sensor after its filter ran, as settled on its stable level or in transition"""
+        slot, sensor, bit = entry
+        if bit & self.always:
+            return
+        if sensor.filter.settled:
+            self.unsettled.pop(entry, None)
+            self.watch |= bit
+            if sensor.last_stable_state != sensor.inverted:
+                self.expected |= bit
+            else:
+                self.expected &= ~bit
+        else:
+            self.unsettled[entry] = None
+            self.watch &= ~bit
+
+    def next_deadline(self) -> float:
+        """Earliest time any time-based motion sensor can time out, recomputed only after pulses or triggers"""
+        if self.deadlines_dirty:
+            self.earliest_deadline = min(
+                (max(motion.last_motion_time, motion.last_trigger_time) + timeout
+                 for motion, timeout, jam_length in zip(self.motion, self.motion_timeouts, self.jam_lengths)
+                 if not jam_length),
+                default=math.inf,
+            )
+            self.deadlines_dirty = False
+        return self.earliest_deadline
+
+    def runout_changed(self, slot: int):
+        """Close the runout state run that a change ended, for the history's filament-present count"""
+        run_end = self.device_samples(self.devices[slot]) - 1  # The changing sample belongs to the new run
+        if not self.runout[slot].last_stable_state:  # Filament was present until now
+            self.present_samples[slot] += run_end - self.present_mark[slot]
+        self.present_mark[slot] = run_end
+
+    def flush_history(self, history: Dict[int, "SensorHistory"], timestamp: float):
+        """Hand each extruder's counts for the closing second to its history"""
+        device_samples = [self.device_samples(device) for device in range(len(self.device_masks))]
+        for slot, extruder_idx in enumerate(self.extruders):
+            samples = device_samples[self.devices[slot]]
+            if samples:
+                present = self.present_samples[slot]
+                if self.runout[slot].last_stable_state:
+                    present += samples - self.present_mark[slot]
+                history[extruder_idx].add_second(timestamp, present, self.motion[slot].pulse_count, samples)
+            self.present_samples[slot] = 0
+            self.present_mark[slot] = 0
+        self.read_samples.clear()
+
+    def set_triggered(self, extruder_idx: int, triggered: bool = True):
+        slot = self.index.get(extruder_idx)
+        if slot is not None:
+            self.triggered[slot] = triggered
+
+    def is_triggered(self, extruder_idx: int) -> bool:
+        slot = self.index.get(extruder_idx)
+        return slot is not None and self.triggered[slot]
+
+    def clear_triggers(self):
+        for slot in range(len(self.triggered)):
+            self.triggered[slot] = False
+
+
+class ActionPlan:
+    """A G-code action template compiled into ready-to-run steps.
+
+    Consecutive G-code lines are batched for a single ``printer.commands()``
+    call, ``@name args`` lines for known actions become action steps and
+    ``;`` comments are only logged. Placeholders like ``{extruder}`` are
+    resolved when the plan is compiled, so firing it does no parsing.
+    """
+
+    GCODE = "gcode"
+    ACTION = "action"
+
+    BUILTIN_ACTIONS = ("pause", "resume", "cancel")
+
+    _PLACEHOLDER = re.compile(r"\{(\w+)\}")
+
+    __slots__ = ("steps", "comments", "fallback")
+
+    def __init__(self, steps: tuple, comments: tuple = (), fallback: bool = False):
+        self.steps = steps  # ((GCODE, (line, ...)) | (ACTION, (name, args)), ...)
+        self.comments = comments
+        self.fallback = fallback  # Template was empty, plan only pauses
+
+    @classmethod
+    def compile(cls, template: Optional[str], placeholders: Dict[str, Any],
+                actions: Iterable[str] = BUILTIN_ACTIONS) -> "ActionPlan":
+        """Compile a template; @commands that are not known actions are sent as G-code"""
+        if not template or not template.strip():
+            return cls(((cls.ACTION, ("pause", "")),), fallback=True)
+
+        actions = set(actions)
+        steps = []
+        comments = []
+        batch = None
+
+        for line in template.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            line = cls._PLACEHOLDER.sub(lambda m: str(placeholders.get(m.group(1), m.group(0))), line)
+
+            if line.startswith(';'):
+                comments.append(line)
+                continue
+
+            if line.startswith('@'):
+                name, _, args = line[1:].partition(' ')
+                if name.lower() in actions:
+                    steps.append((cls.ACTION, (name.lower(), args.strip())))
+                    batch = None
+                    continue
+
+            if batch is None:
+                batch = []
+                steps.append((cls.GCODE, batch))
+            batch.append(line)
+
+        steps = tuple((kind, tuple(payload)) for kind, payload in steps)
+        return cls(steps, tuple(comments))
+
+
+class ExtrusionTracker:
+    """Incremental E-axis tracker fed line by line from the G-code sent hook.
+
+    Follows absolute/relative extrusion (M82/M83, G90/G91) and ``G92`` so
+    each move's E delta is known, and accumulates the commanded filament
+    length per tool. Retractions count too, since a motion encoder pulses
+    in both directions. Totals only ever grow, so the monitoring loop can
+    take lock-free snapshots and compare them against motion pulses.
+    """
+
+    __slots__ = ("absolute", "position", "extruded", "moves")
+
+    def __init__(self, tools: int = MAX_EXTRUDERS):
+        self.absolute = True
+        self.position = 0.0
+        self.extruded = [0.0] * tools  # Cumulative commanded filament per tool, mm
+        self.moves = 0  # Extruding moves seen
+
+    def reset(self):
+        """Start of a print: firmware defaults to absolute E at position 0"""
+        self.absolute = True
+        self.position = 0.0
+
+    def feed(self, gcode: str, cmd: str, tool: int):
+        """Account for one sent line whose parsed code is in EXTRUSION_CODES"""
+        if gcode == "M82" or gcode == "G90":
+            self.absolute = True
+            return
+        if gcode == "M83" or gcode == "G91":
+            self.absolute = False
+            return
+
+        value = self.parse_e(cmd)
+        if gcode == "G92":
+            if value is not None:
+                self.position = value
+            elif len(cmd.split(';', 1)[0].split()) == 1:
+                self.position = 0.0  # A bare G92 zeroes every axis
+            return
+        if value is None:
+            return
+
+        if self.absolute:
+            delta = value - self.position
+            self.position = value
+        else:
+            delta = value
+            self.position += value
+
+        if delta and tool < len(self.extruded):
+            self.extruded[tool] += delta if delta > 0 else -delta
+            self.moves += 1
+
+    @staticmethod
+    def parse_e(cmd: str) -> Optional[float]:
+        """E parameter of a command, ignoring comments; None if absent"""
+        start = cmd.find('E', 1)
+        if start < 0:
+            return None
+        comment = cmd.find(';')
+        if 0 <= comment < start:
+            return None
+
+        end = start + 1
+        length = len(cmd)
+        while end < length and cmd[end] in "0123456789.-+":
+            end += 1
+        try:
+            return float(cmd[start + 1:end])
+        except ValueError:
+            return None
+
+    def get_extruded(self, tool: int) -> float:
+        return self.extruded[tool] if tool < len(self.extruded) else 0.0
+
+
+@dataclass(frozen=True)
+class ExtruderConfig:
+    """Compiled per-extruder sensor settings"""
+
+    enabled: bool
+    device: int
+    runout_pin: int
+    runout_inverted: bool
+    motion_pin: int
+    motion_inverted: bool
+    motion_timeout: float
+    debounce_time: float
+    mm_per_pulse: float
+    runout_filter: str
+    motion_filter: str
+    motion_filter_time: float
+
+
+@dataclass(frozen=True)
+class MonitorConfig:
+    """Immutable snapshot of the settings read by the monitoring loop.
+
+    Built from OctoPrint's settings tree whenever sensors are (re)initialized
+    and swapped in as a whole, so the hot loop only reads plain attributes.
+    The mappings are read-only views, so a snapshot cannot be changed in place.
+    """
+
+    poll_interval: float
+    device_read_timeout: float
+    ioc_poll_interval: float
+    burst_sampling: bool
+    burst_window: float
+    burst_sample_interval: float
+    burst_buffer_size: int
+    burst_isolated: bool
+    deep_idle_enabled: bool
+    prevent_print_start: bool
+    only_active_extruder: bool
+    notification_enabled: bool
+    debug_logging: bool
+    extrusion_tracking: bool
+    jam_length_ratio: float
+    extruders: Mapping[int, ExtruderConfig]
+    action_plans: Mapping[str, Mapping[int, ActionPlan]]  # Trigger event -> extruder -> plan
+
+    @classmethod
+    def from_settings(cls, settings, actions: Iterable[str] = ActionPlan.BUILTIN_ACTIONS) -> "MonitorConfig":
+        extruder_count = min(max(settings.get_int(["extruder_count"]) or 1, 1), MAX_EXTRUDERS)
+
+        extruders = {}
+        for extruder_idx in range(extruder_count):
+            prefix = f"e{extruder_idx}_"
+            extruders[extruder_idx] = ExtruderConfig(
+                enabled=settings.get_boolean([prefix + "enabled"]),
+                device=settings.get_int([prefix + "device"]) or 0,
+                runout_pin=settings.get_int([prefix + "runout_pin"]),
+                runout_inverted=settings.get_boolean([prefix + "runout_inverted"]),
+                motion_pin=settings.get_int([prefix + "motion_pin"]),
+                motion_inverted=settings.get_boolean([prefix + "motion_inverted"]),
+                motion_timeout=settings.get_float([prefix + "motion_timeout"]),
+                debounce_time=settings.get_float([prefix + "debounce_time"]),
+                mm_per_pulse=settings.get_float([prefix + "mm_per_pulse"]) or 0.0,
+                runout_filter=cls._filter_kind(settings.get([prefix + "runout_filter"]), "runout"),
+                motion_filter=cls._filter_kind(settings.get([prefix + "motion_filter"]), "motion"),
+                motion_filter_time=settings.get_float([prefix + "motion_filter_time"]) or 0.0,
+            )
+
+        actions = tuple(actions)
+        action_plans = {}
+        for event, (setting, _) in TRIGGER_EVENTS.items():
+            template = settings.get([setting])
+            action_plans[event] = MappingProxyType({
+                extruder_idx: ActionPlan.compile(template, {"extruder": extruder_idx, "event": event}, actions)
+                for extruder_idx in extruders
+            })
+
+        return cls(
+            poll_interval=max(settings.get_float(["poll_interval"]) or 0.0, MIN_POLL_INTERVAL),
+            device_read_timeout=settings.get_float(["device_read_timeout"]),
+            ioc_poll_interval=settings.get_float(["ioc_poll_interval"]),
+            burst_sampling=settings.get_boolean(["burst_sampling_enabled"]),
+            burst_window=max(settings.get_float(["burst_window"]) or FAST_POLL_INTERVAL, MIN_POLL_INTERVAL),
+            burst_sample_interval=settings.get_float(["burst_sample_interval"]) or 0.0,
+            burst_buffer_size=settings.get_int(["burst_buffer_size"]) or 4096,
+            burst_isolated=settings.get_boolean(["burst_isolated_enabled"]),
+            deep_idle_enabled=settings.get_boolean(["deep_idle_enabled"]),
+            prevent_print_start=settings.get_boolean(["prevent_print_start"]),
+            only_active_extruder=settings.get_boolean(["only_active_extruder"]),
+            notification_enabled=settings.get_boolean(["notification_enabled"]),
+            debug_logging=settings.get_boolean(["debug_logging"]),
+            extrusion_tracking=settings.get_boolean(["extrusion_tracking_enabled"]),
+            jam_length_ratio=settings.get_float(["jam_length_ratio"]) or 0.0,
+            extruders=MappingProxyType(extruders),
+            action_plans=MappingProxyType(action_plans),
+        )
+
+    @staticmethod
+    def _filter_kind(kind: Optional[str], sensor_type: str) -> str:
+        return kind if kind in SENSOR_FILTERS else DEFAULT_SENSOR_FILTERS[sensor_type]
+
+
+class Histogram:
+    """Fixed-bucket histogram with a running sum, updated in O(log buckets)"""
+
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: tuple):
+        self.bounds = bounds  # Upper bounds, the last bucket is everything above
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class LoopProfiler:
+    """Rolling per-stage timings of the monitoring loop.
+
+    Each stage keeps its last ``window`` durations (nanoseconds, from
+    ``perf_counter_ns``) in a preallocated ring, so recording is an index
+    store. Percentiles are only computed when stats are requested.
+    """
+
+    STAGES = ("lock_wait", "usb_read", "evaluate", "publish", "pass")
+
+    def __init__(self, window: int = 1024):
+        self.window = window
+        self._samples = {stage: array.array("q", [0]) * window for stage in self.STAGES}
+        self._counts = dict.fromkeys(self.STAGES, 0)
+        self._max = dict.fromkeys(self.STAGES, 0)
+
+    def record(self, stage: str, elapsed_ns: int):
+        count = self._counts[stage]
+        self._samples[stage][count % self.window] = elapsed_ns
+        self._counts[stage] = count + 1
+        if elapsed_ns > self._max[stage]:
+            self._max[stage] = elapsed_ns
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        """p50/p95/p99 over the window and the all-time max per stage, in microseconds"""
+        stats = {}
+        for stage in self.STAGES:
+            held = min(self._counts[stage], self.window)
+            values = sorted(self._samples[stage][:held])
+
+            def percentile(fraction):
+                return round(values[min(int(fraction * held), held - 1)] / 1000.0, 1) if held else 0.0
+
+            stats[stage] = {
+                "count": self._counts[stage],
+                "p50_us": percentile(0.50),
+                "p95_us": percentile(0.95),
+                "p99_us": percentile(0.99),
+                "max_us": round(self._max[stage] / 1000.0, 1),
+            }
+        return stats
+
+
+def sample_thread_stacks(thread_id: int, duration: float, interval: float = 0.001,
+                         top: int = 25) -> Dict[str, Any]:
+    """Statistical profile of one thread: sample its stack every ``interval`` for ``duration`` seconds"""
+    total_counts = {}  # type: Dict[str, int]
+    self_counts = {}  # type: Dict[str, int]
+    samples = 0
+    deadline = time.monotonic() + duration
+
+    while time.monotonic() < deadline:
+        frame = sys._current_frames().get(thread_id)
+        if frame is None:
+            break
+        samples += 1
+
+        leaf = True
+        seen = set()
+        while frame is not None:
+            code = frame.f_code
+            key = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            if leaf:
+                self_counts[key] = self_counts.get(key, 0) + 1
+                leaf = False
+            if key not in seen:
+                seen.add(key)
+                total_counts[key] = total_counts.get(key, 0) + 1
+            frame = frame.f_back
+        time.sleep(interval)
+
+    ranked = sorted(total_counts.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {
+        "samples": samples,
+        "functions": [
+            {
+                "function": key,
+                "total_percent": round(100.0 * count / samples, 1),
+                "self_percent": round(100.0 * self_counts.get(key, 0) / samples, 1),
+            }
+            for key, count in ranked
+        ],
+    }
+
+
+class TransactionCounter:
+    """Count USB HID transactions and report them as a per-second rate"""
+
+    def __init__(self, window_seconds: float = 1.0):
+        self.window_seconds = window_seconds
+        self.total = 0
+        self.rate = 0.0
+        self._window_start = time.monotonic()
+        self._window_count = 0
+
+    def increment(self, current_time: Optional[float] = None, count: int = 1):
+        """Record ``count`` transactions, closing the rate window once it has elapsed"""
+        if current_time is None:
+            current_time = time.monotonic()
+        self.total += count
+        self._window_count += count
+        elapsed = current_time - self._window_start
+        if elapsed >= self.window_seconds:
+            self.rate = self._window_count / elapsed
+            self._window_start = current_time
+            self._window_count = 0
+
+    def get_rate(self, current_time: Optional[float] = None) -> float:
+        """Get transactions per second, or 0 once no transaction closed a recent window"""
+        if current_time is None:
+            current_time = time.monotonic()
+        if current_time - self._window_start > 2 * self.window_seconds:
+            return 0.0
+        return self.rate
+
+
+class SampleRing:
+    """Preallocated ring of GPIO snapshots filled by a burst reader and drained by the monitoring loop.
+
+    Each entry is a ``perf_counter_ns`` timestamp and a byte holding the four
+    pin levels plus ``LATCHED`` for the GP1 interrupt-on-change latch. One
+    thread pushes and one drains, so the write counter is only advanced
+    after the entry is stored and no lock is taken. Entries the reader
+    overwrote before they were drained are counted as overruns.
+
+    ``drain_edges`` reduces the dense trace to the entries the filters need:
+    both sides of every level change, latched pulses, and one entry per
+    ``tick`` while the levels hold, so time-based filters still see time
+    pass. An edge is stamped midway between the two reads around it.
+    """
+
+    LATCHED = 0x10
+
+    ready = True  # Whether the reader is sampling yet
+    stopping = False  # Checked by the reader before every read
+
+    __slots__ = ("capacity", "times", "values", "written", "consumed", "overruns", "previous", "last_kept")
+
+    def __init__(self, capacity: int = 4096):
+        self.capacity = max(int(capacity), 1)
+        self.times = array.array("q", [0]) * self.capacity
+        self.values = array.array("B", [0]) * self.capacity
+        self.written = 0  # Entries ever pushed
+        self.consumed = 0  # Entries ever drained or overrun
+        self.overruns = 0
+        self.previous = None  # type: Optional[tuple]  # Last drained (timestamp_ns, value), across drains
+        self.last_kept = None  # type: Optional[int]
+
+    def __len__(self):
+        return self.written - self.consumed
+
+    def push(self, timestamp_ns: int, value: int):
+        index = self.written % self.capacity
+        self.times[index] = timestamp_ns
+        self.values[index] = value
+        self.written += 1
+
+    def drain(self) -> tuple:
+        """All entries pushed since the previous drain, as ``(times, values)`` arrays"""
+        written = self.written
+        start = max(self.consumed, written - self.capacity)
+        times, values = self._copy(start, written)
+
+        # The reader may have lapped the oldest entries while they were copied
+        lapped = self.written - self.capacity
+        if lapped > start:
+            times, values = times[lapped - start:], values[lapped - start:]
+            start = lapped
+        self.overruns += start - self.consumed
+        self.consumed = written
+        return times, values
+
+    def drain_edges(self, relevant: int, tick_ns: int) -> List[tuple]:
+        """Drain and reduce to ``(timestamp_ns, value)`` entries, keeping changes of the ``relevant`` pin bits"""
+        times, values = self.drain()
+        kept = []
+        previous = self.previous
+        last_kept = self.last_kept
+        for timestamp, value in zip(times, values):
+            if previous is not None and (value ^ previous[1]) & relevant:
+                if previous[0] != last_kept:
+                    kept.append(previous)  # Close the old level at its last read
+                last_kept = (previous[0] + timestamp) // 2
+                kept.append((last_kept, value))
+            elif last_kept is None or value & self.LATCHED or timestamp - last_kept >= tick_ns:
+                last_kept = timestamp
+                kept.append((timestamp, value))
+            previous = (timestamp, value)
+        if previous is not None and previous[0] != last_kept:
+            # Bring the filters up to the newest read
+            last_kept = previous[0]
+            kept.append(previous)
+        self.previous = previous
+        self.last_kept = last_kept
+        return kept
+
+    def _copy(self, start: int, end: int) -> tuple:
+        count = end - start
+        if count <= 0:
+            return self.times[:0], self.values[:0]
+        first = start % self.capacity
+        if first + count <= self.capacity:
+            return self.times[first:first + count], self.values[first:first + count]
+        wrapped = first + count - self.capacity
+        return self.times[first:] + self.times[:wrapped], self.values[first:] + self.values[:wrapped]
+
+
+class SharedSampleRing(SampleRing):
+    """``SampleRing`` in a ``multiprocessing.shared_memory`` block, filled by a sampler process.
+
+    The block holds a header of int64 fields, the text of the error that
+    ended the sampler, then the entries. Each entry also stores its sequence
+    number, written after the data, so the plugin never takes an entry the
+    other process has not finished writing; entries the sampler may have
+    been rewriting while they were copied are dropped as overruns. The
+    sampler publishes its device's transaction count and read latency
+    buckets every ``PUBLISH_EVERY`` reads. The plugin only reads the block,
+    apart from the stop flag.
+    """
+
+    WRITTEN, STOP, READY, ERROR_LENGTH, TRANSACTIONS, LATENCY_SUM_NS, LATENCY_BUCKETS = range(7)
+    HEADER_FIELDS = 16
+    ERROR_SIZE = 256
+    PUBLISH_EVERY = 64
+
+    __slots__ = ("shm", "header", "seqs", "parent_pid", "source")
+
+    def __init__(self, capacity: int = 4096, name: Optional[str] = None):
+        capacity = max(int(capacity), 1)
+        offset = 8 * self.HEADER_FIELDS + self.ERROR_SIZE
+        create = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=offset + 17 * capacity if create else 0)
+        buf = self.shm.buf
+        self.header = buf[:8 * self.HEADER_FIELDS].cast("q")
+        self.seqs = buf[offset:offset + 8 * capacity].cast("q")
+        self.times = buf[offset + 8 * capacity:offset + 16 * capacity].cast("q")
+        self.values = buf[offset + 16 * capacity:offset + 17 * capacity]
+        self.capacity = capacity
+        self.consumed = 0
+        self.overruns = 0
+        self.previous = None
+        self.last_kept = None
+        self.parent_pid = None if create else os.getppid()  # Set in the sampler process
+        self.source = None  # type: Optional[BridgeDevice]  # Device whose counters the sampler publishes
+        if create:
+            self.seqs[:] = array.array("q", [-1]) * capacity
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @property
+    def written(self) -> int:
+        return self.header[self.WRITTEN]
+
+    @property
+    def ready(self) -> bool:
+        return bool(self.header[self.READY])
+
+    @property
+    def stopping(self) -> bool:
+        if self.header[self.STOP]:
+            return True
+        # An orphaned sampler stops by itself
+        return self.parent_pid is not None and self.header[self.WRITTEN] % 1024 == 0 and \
+            os.getppid() != self.parent_pid
+
+    def push(self, timestamp_ns: int, value: int):
+        written = self.header[self.WRITTEN]
+        index = written % self.capacity
+        self.times[index] = timestamp_ns
+        self.values[index] = value
+        self.seqs[index] = written
+        self.header[self.WRITTEN] = written + 1
+        if written % self.PUBLISH_EVERY == 0:
+            self.publish()
+
+    def publish(self):
+        """Copy the source device's counters into the header"""
+        source = self.source
+        if source is None:
+            return
+        header = self.header
+        header[self.TRANSACTIONS] = source.transactions.total
+        header[self.LATENCY_SUM_NS] = int(source.read_latency.sum * 1e9)
+        for bucket, count in enumerate(source.read_latency.counts):
+            header[self.LATENCY_BUCKETS + bucket] = count
+
+    def fail(self, error: Exception):
+        """Leave the error that ended the sampler for the plugin"""
+        text = str(error).encode("utf-8", "replace")[:self.ERROR_SIZE]
+        start = 8 * self.HEADER_FIELDS
+        self.shm.buf[start:start + len(text)] = text
+        self.header[self.ERROR_LENGTH] = len(text)
+
+    def failure(self) -> Optional[str]:
+        length = self.header[self.ERROR_LENGTH]
+        if not length:
+            return None
+        start = 8 * self.HEADER_FIELDS
+        return bytes(self.shm.buf[start:start + length]).decode("utf-8", "replace")
+
+    def drain(self) -> tuple:
+        written = self.written
+        start = max(self.consumed, written - self.capacity)
+        times, values, seqs = self._copy_entries(start, written)
+
+        # Entries the sampler may have been rewriting while they were copied are dropped,
+        # and one whose sequence number is not visible yet ends the batch until the next drain
+        begin = max(self.written + 1 - self.capacity - start, 0)
+        end = begin
+        while end < len(seqs) and seqs[end] == start + end:
+            end += 1
+        self.overruns += start + begin - self.consumed
+        self.consumed = start + end
+        return times[begin:end], values[begin:end]
+
+    def _copy_entries(self, start: int, end: int) -> tuple:
+        count = end - start
+        if count <= 0:
+            return [], [], []
+        first = start % self.capacity
+        spans = [(first, min(first + count, self.capacity))]
+        if first + count > self.capacity:
+            spans.append((0, first + count - self.capacity))
+        return tuple(
+            [entry for span_start, span_end in spans for entry in column[span_start:span_end].tolist()]
+            for column in (self.times, self.values, self.seqs)
+        )
+
+    def close(self, unlink: bool = False):
+        for view in (self.header, self.seqs, self.times, self.values):
+            view.release()
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+def run_sampler(name: str, capacity: int, label: str, device_args: Dict[str, Any], mock: Optional[tuple],
+                ioc_edge: Optional[str], min_interval_ns: int):
+    """Sampler process entry point: open one bridge and burst-sample it into a ``SharedSampleRing``.
+
+    ``mock`` is ``(scenario, read_delay, epoch)`` of a mock bridge to rebuild
+    here, as HID handles cannot be shared between processes. ``ioc_edge``
+    re-applies the GP1 interrupt-on-change latch on the new handle.
+    """
+    ring = SharedSampleRing(capacity, name=name)
+    try:
+        if mock is not None:
+            scenario, read_delay, epoch = mock
+            mcp = MockMCP2221A(usbserial=label, read_delay=read_delay, scenario=scenario, epoch=epoch)
+        else:
+            mcp = MCP2221FilamentSensorPlugin._open_handle(device_args)
+        if ioc_edge:
+            mcp.set_pin_function(gp1="IOC")
+            mcp.IOC_config(edge=ioc_edge)
+            mcp.IOC_clear()
+    except Exception as e:
+        ring.fail(e)
+        ring.close()
+        return
+
+    device = BridgeDevice(0, mcp, label, is_mock=mock is not None, device_args=device_args)
+    device.ioc_active = bool(ioc_edge)
+    ring.source = device
+    ring.header[ring.READY] = 1
+    device._burst_active = True
+    try:
+        device._burst_loop(ring, min_interval_ns)
+        ring.publish()
+        if device.burst_error is not None:
+            ring.fail(device.burst_error)
+    finally:
+        if hasattr(mcp, 'close'):
+            try:
+                mcp.close()
+            except Exception:
+                pass
+        ring.close()
+
+
+class BridgeDevice:
+    """One MCP2221A bridge, its latest GPIO snapshot and an optional reader thread.
+
+    With several bridges each device is read by its own thread, so a slow or
+    wedged device only delays its own snapshot while the others keep
+    sampling. A single bridge is read inline by the monitoring loop. In
+    burst mode a further thread reads the device back to back into a
+    ``SampleRing`` that the monitoring loop drains once per cycle. Isolated
+    burst mode moves that reader into its own process, sharing the ring
+    through shared memory, so its timing does not depend on OctoPrint's GIL.
+    The sampler opens its own handle, so ours is closed meanwhile and kept
+    in ``released_handle`` for the plugin to reopen.
+
+    The device also carries its connection state: ``connected``, ``degraded``
+    after a failed read, ``reconnecting`` once reads keep failing (the handle
+    is reopened with exponential backoff) and ``failed`` when the configured
+    number of reconnect attempts is exhausted.
+    """
+
+    CONNECTED = "connected"
+    DEGRADED = "degraded"
+    RECONNECTING = "reconnecting"
+    FAILED = "failed"
+
+    ERRORS_BEFORE_RECONNECT = 3
+    BACKOFF_INITIAL = 0.5
+    BACKOFF_MAX = 30.0
+
+    # Upper bounds (seconds) of the HID read latency histogram buckets
+    READ_LATENCY_BOUNDS = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1)
+
+    def __init__(self, index: int, mcp, label: str, is_mock: bool = False,
+                 device_args: Optional[Dict[str, Any]] = None):
+        self.index = index
+        self.mcp = mcp
+        self.label = label
+        self.is_mock = is_mock
+        self.device_args = device_args or {}  # EasyMCP2221.Device kwargs used to reopen
+        self.ioc_active = False  # GP1 motion pulses latched by interrupt-on-change
+        self.ioc_edge = None  # type: Optional[str]  # Latched edge while ioc_active
+
+        # Connection supervision
+        self.state = self.CONNECTED if mcp is not None else self.RECONNECTING
+        self.consecutive_errors = 0
+        self.reconnects = 0  # Successful reopens
+        self.reconnect_attempts = 0  # Attempts during the current outage
+        self.backoff = self.BACKOFF_INITIAL
+        self.next_retry_at = time.monotonic() if mcp is None else 0.0
+        self.down_since = time.monotonic() if mcp is None else None  # type: Optional[float]
+        self.downtime = 0.0  # Seconds spent not connected in past outages
+
+        # Latest snapshot
+        self.readings = (None, None, None, None)
+        self.level_mask = 0  # Bit per pin that read high
+        self.sample_time = 0.0
+        self.ioc_latched = False
+        self.read_error = None  # type: Optional[Exception]
+
+        self.transactions = TransactionCounter()
+        self.stalls = 0  # Cycles in which the device did not answer in time
+        self.read_errors = 0
+        self.read_latency = Histogram(self.READ_LATENCY_BOUNDS)
+        self.clock = time.monotonic  # Replaced by a SimulatedClock during replays
+
+        self._reader = None
+        self._reader_active = False
+        self._opener = None  # Thread reopening the handle during a reconnect
+        self._opened = None  # type: Optional[tuple]  # (handle, error) left by the opener thread
+        self._request = threading.Event()
+        self._done = threading.Event()
+        self._busy = False
+        # Handoff between the monitoring loop and the reader thread; each request gets a new generation
+        # and only a read made for the current one is stored and completes it
+        self._handoff = threading.Lock()
+        self._generation = 0
+        self._completed = 0
+
+        # Burst sampling into a ring buffer, instead of one read per cycle
+        self.ring = None  # type: Optional[SampleRing]
+        self.burst_error = None  # type: Optional[Exception]  # Read error that ended the burst thread
+        self.burst_reads = 0  # Burst samples drained, including overruns
+        self.burst_overruns = 0  # Burst samples overwritten before they were drained
+        self._burst = None
+        self._burst_active = False
+        self._burst_origin = (0.0, 0)
+        self._sampler = None  # Sampler process in isolated burst mode
+        self.released_handle = None  # Our handle, closed while the sampler process owns the bridge
+        self._published = (0, 0, ())  # Sampler counters already added: transactions, latency sum (ns), buckets
+
+    @property
+    def readable(self) -> bool:
+        return self.mcp is not None and self.state in (self.CONNECTED, self.DEGRADED)
+
+    def record_success(self, current_time: float):
+        """Mark a successful read, closing any outage"""
+        if self.down_since is not None:
+            self.downtime += current_time - self.down_since
+            self.down_since = None
+        self.state = self.CONNECTED
+        self.consecutive_errors = 0
+        self.reconnect_attempts = 0
+        self.backoff = self.BACKOFF_INITIAL
+        self.read_error = None
+
+    def record_failure(self, error: Exception, current_time: float):
+        """Mark a failed read, moving to reconnecting once errors persist"""
+        self.read_error = error
+        self.read_errors += 1
+        self.consecutive_errors += 1
+        if self.down_since is None:
+            self.down_since = current_time
+        if self.state == self.CONNECTED:
+            self.state = self.DEGRADED
+        if self.state == self.DEGRADED and self.consecutive_errors >= self.ERRORS_BEFORE_RECONNECT:
+            # Backoff carries on across reopen attempts until a read succeeds
+            self.state = self.RECONNECTING
+            self.next_retry_at = max(current_time, self.next_retry_at)
+
+    def record_reopen(self, mcp):
+        """Install a freshly opened handle; the outage ends with the first good read"""
+        self.mcp = mcp
+        self.reconnects += 1
+        self.state = self.DEGRADED
+        self.consecutive_errors = 0
+
+    def schedule_retry(self, current_time: float):
+        """Count a reconnect attempt and back off before the next one"""
+        self.reconnect_attempts += 1
+        self.next_retry_at = current_time + self.backoff
+        self.backoff = min(self.backoff * 2, self.BACKOFF_MAX)
+
+    def get_downtime(self, current_time: Optional[float] = None) -> float:
+        """Total seconds this bridge has been degraded or disconnected"""
+        if self.down_since is None:
+            return self.downtime
+        if current_time is None:
+            current_time = time.monotonic()
+        return self.downtime + (current_time - self.down_since)
+
+    def read(self):
+        """Read all four GPIO pins in one HID transaction, plus the IOC latch when enabled.
+
+        The snapshot is stamped with the time of the read, which callers use
+        as the sample time for every sensor on this device.
+        """
+        self._store(*self._sample())
+
+    def _sample(self) -> tuple:
+        start = self.clock()
+        readings = self.mcp.GPIO_read()
+        sample_time = self.clock()
+        self.read_latency.observe(sample_time - start)
+        self.transactions.increment(sample_time)
+        return readings, sample_time, self._read_latch()
+
+    def _read_latch(self) -> bool:
+        """Read and clear the GP1 interrupt-on-change latch, if enabled"""
+        if not self.ioc_active:
+            return False
+        ioc_latched = bool(self.mcp.IOC_read())
+        self.transactions.increment()
+        if ioc_latched:
+            self.mcp.IOC_clear()
+            self.transactions.increment()
+        return ioc_latched
+
+    def _store(self, readings, sample_time: float, ioc_latched: bool):
+        self.readings = readings
+        self.level_mask = (1 if readings[0] else 0) | (2 if readings[1] else 0) | \
+            (4 if readings[2] else 0) | (8 if readings[3] else 0)
+        self.sample_time = sample_time
+        self.ioc_latched = ioc_latched
+
+    ##~~ Burst sampling
+
+    @property
+    def bursting(self) -> bool:
+        if self._sampler is not None:
+            return self._sampler.is_alive()
+        return self._burst is not None and self._burst.is_alive()
+
+    @property
+    def isolated(self) -> bool:
+        return self._sampler is not None
+
+    def start_burst(self, capacity: int, min_interval: float = 0.0, isolated: bool = False):
+        """Start sampling back to back into a fresh ``SampleRing``, on a dedicated thread or in a sampler process"""
+        if self.bursting:
+            return
+        self._release_ring()
+        self.burst_error = None
+        # Ring timestamps are perf_counter_ns, mapped onto the device clock from this common origin.
+        # perf_counter reads the same system-wide clock in a sampler process on Linux, macOS and Windows.
+        self._burst_origin = (self.clock(), time.perf_counter_ns())
+        if isolated:
+            self._start_sampler(capacity, min_interval)
+            return
+
+        self.ring = SampleRing(capacity)
+        self._burst_active = True
+        self._burst = threading.Thread(target=self._burst_loop, args=(self.ring, int(min_interval * 1e9)),
+                                       name=f"mcp2221-burst-{self.label}", daemon=True)
+        self._burst.start()
+
+    def stop_burst(self):
+        self._burst_active = False
+        if self._burst and self._burst.is_alive():
+            self._burst.join(timeout=1.0)
+        self._burst = None
+
+        sampler = self._sampler
+        if sampler is not None:
+            self.ring.header[SharedSampleRing.STOP] = 1
+            sampler.join(timeout=1.0)
+            if sampler.is_alive():
+                sampler.terminate()
+                sampler.join(timeout=1.0)
+            self._sampler = None
+            self._release_ring()
+
+    def _start_sampler(self, capacity: int, min_interval: float):
+        ring = SharedSampleRing(capacity)
+        mock = (self.mcp.scenario, self.mcp.read_delay, self.mcp.epoch) if self.is_mock else None
+        # With Linux hidraw every open handle receives a copy of each input report, so ours would
+        # queue replies to the sampler's reads and hand them to the next inline read
+        self._release_handle()
+        # Spawned rather than forked, as OctoPrint runs many threads
+        self._sampler = multiprocessing.get_context("spawn").Process(
+            target=run_sampler,
+            args=(ring.name, ring.capacity, self.label, self.device_args, mock,
+                  self.ioc_edge if self.ioc_active else None, int(min_interval * 1e9)),
+            name=f"mcp2221-sampler-{self.label}", daemon=True,
+        )
+        self.ring = ring
+        self._published = (0, 0, (0,) * len(self.read_latency.counts))
+        try:
+            self._sampler.start()
+        except Exception:
+            self._sampler = None
+            self._release_ring()
+            raise
+
+    def _release_handle(self):
+        mcp, self.mcp = self.mcp, None
+        self.released_handle = mcp
+        if hasattr(mcp, 'close'):
+            try:
+                mcp.close()
+            except Exception:
+                pass
+
+    def _collect_sampler(self):
+        """Add the counters the sampler process published since the last cycle, and pick up its exit"""
+        ring = self.ring
+        header = ring.header
+        transactions, latency_sum, buckets = self._published
+        published = (
+            header[ring.TRANSACTIONS],
+            header[ring.LATENCY_SUM_NS],
+            tuple(header[ring.LATENCY_BUCKETS:ring.LATENCY_BUCKETS + len(buckets)]),
+        )
+        if published[0] > transactions:
+            self.transactions.increment(count=published[0] - transactions)
+        latency = self.read_latency
+        for bucket, (count, previous) in enumerate(zip(published[2], buckets)):
+            latency.counts[bucket] += count - previous
+            latency.count += count - previous
+        latency.sum += (published[1] - latency_sum) * 1e-9
+        self._published = published
+
+        sampler = self._sampler
+        if not sampler.is_alive():
+            failure = ring.failure()
+            if failure is not None or sampler.exitcode:
+                self.burst_error = OSError(failure or f"sampler process exited with code {sampler.exitcode}")
+            self._sampler = None
+            self._release_ring()
+
+    def _release_ring(self):
+        if isinstance(self.ring, SharedSampleRing):
+            self.ring.close(unlink=True)
+        self.ring = None
+
+    def drain_burst(self, relevant: int, tick: float) -> List[tuple]:
+        """Edges and tick samples read since the last drain, as ``(sample_time, level_mask, ioc_latched)``"""
+        ring = self.ring
+        if ring is None:
+            return []
+        consumed, overruns = ring.consumed, ring.overruns
+        edges = ring.drain_edges(relevant, int(tick * 1e9))
+        self.burst_reads += ring.consumed - consumed
+        self.burst_overruns += ring.overruns - overruns
+        origin_time, origin_ns = self._burst_origin
+        samples = [
+            (origin_time + (timestamp - origin_ns) * 1e-9, value & 0x0F, bool(value & SampleRing.LATCHED))
+            for timestamp, value in edges
+        ]
+
+        if self._sampler is not None:
+            if samples:
+                # The snapshot is only updated in the sampler process, mirror its latest read here
+                sample_time, level_mask, ioc_latched = samples[-1]
+                readings = tuple(None if pin == IOC_PIN and self.ioc_active else bool(level_mask >> pin & 1)
+                                 for pin in range(4))
+                self._store(readings, sample_time, ioc_latched)
+            self._collect_sampler()
+        return samples
+
+    def _burst_loop(self, ring: SampleRing, min_interval_ns: int):
+        clock_ns = time.perf_counter_ns
+        latched_flag = SampleRing.LATCHED
+        next_read = 0
+        while self._burst_active and not ring.stopping:
+            if min_interval_ns:
+                now = clock_ns()
+                if now < next_read:
+                    time.sleep((next_read - now) * 1e-9)
+                next_read = max(now, next_read) + min_interval_ns
+            try:
+                start = clock_ns()
+                readings = self.mcp.GPIO_read()
+                timestamp = clock_ns()
+                self.read_latency.observe((timestamp - start) * 1e-9)
+                self.transactions.increment()
+                ioc_latched = self._read_latch()
+            except Exception as e:
+                # The monitoring loop reports the failure and restarts the burst
+                self.burst_error = e
+                break
+            self._store(readings, self._burst_origin[0] + (timestamp - self._burst_origin[1]) * 1e-9, ioc_latched)
+            ring.push(timestamp, self.level_mask | (latched_flag if ioc_latched else 0))
+
+    ##~~ Reconnect opener thread
+
+    @property
+    def opening(self) -> bool:
+        return self._opener is not None
+
+    def open_in_background(self, opener: Callable[[], Any]):
+        """Call ``opener`` on a thread; collect its handle or error with ``take_opened``"""
+        self._opened = None
+
+        def run():
+            try:
+                self._opened = (opener(), None)
+            except Exception as e:
+                self._opened = (None, e)
+
+        self._opener = threading.Thread(target=run, name=f"mcp2221-opener-{self.label}", daemon=True)
+        self._opener.start()
+
+    def take_opened(self) -> Optional[tuple]:
+        """``(handle, error)`` of a finished background open, None while it is still running"""
+        opened = self._opened
+        if opened is not None:
+            self._opener = None
+            self._opened = None
+        return opened
+
+    def stop_opening(self):
+        """Wait briefly for a background open and close the handle it produced"""
+        if self._opener is not None:
+            self._opener.join(timeout=1.0)
+        opened = self.take_opened()
+        self._opener = None
+        if opened is not None and hasattr(opened[0], 'close'):
+            try:
+                opened[0].close()
+            except Exception:
+                pass
+
+    ##~~ Reader thread
+
+    def start_reader(self):
+        if self._reader and self._reader.is_alive():
+            return
+        self._reader_active = True
+        self._reader = threading.Thread(target=self._reader_loop, name=f"mcp2221-reader-{self.label}", daemon=True)
+        self._reader.start()
+
+    def stop_reader(self):
+        self._reader_active = False
+        self._request.set()
+        if self._reader and self._reader.is_alive():
+            self._reader.join(timeout=1.0)
+        self._reader = None
+
+    def request(self) -> bool:
+        """Ask the reader thread for a fresh snapshot. Returns False if the previous read is still running."""
+        with self._handoff:
+            if self._busy:
+                return False
+            self._busy = True
+            self._generation += 1
+            self._done.clear()
+            self._request.set()
+        return True
+
+    def wait(self, timeout: float) -> bool:
+        """Wait for the requested snapshot. Returns True if it arrived within ``timeout``."""
+        return self._done.wait(timeout) and self._completed == self._generation
+
+    def _reader_loop(self):
+        while self._reader_active:
+            self._request.wait()
+            with self._handoff:
+                self._request.clear()
+                generation = self._generation
+            if not self._reader_active:
+                break
+            snapshot = error = None
+            try:
+                snapshot = self._sample()
+            except Exception as e:
+                error = e
+            with self._handoff:
+                if generation == self._generation:
+                    # The snapshot changes only here, before the waiting loop is released
+                    if snapshot is not None:
+                        self._store(*snapshot)
+                    self.read_error = error
+                    self._completed = generation
+                    self._done.set()
+                self._busy = False
+
+
+class EventJournal:
+    """Fixed-size, memory-mapped ring buffer of sensor events.
+
+    Records are packed straight into a preallocated file mapping, so an
+    append is a ``struct.pack_into`` with no syscall. The kernel writes dirty
+    pages back on its own schedule, coalescing repeated writes to the same
+    pages instead of issuing one SD card write per event. Once the file is
+    full the newest record overwrites the oldest. The header keeps the total
+    record count, so the journal survives restarts.
+
+    Records are ordered by a stamp taken from the monotonic clock plus an
+    offset fixed when the journal is opened, which starts it at the wall time
+    but never below the newest stored stamp. Stepping the wall clock, e.g.
+    by NTP, therefore cannot break the ordering range queries bisect on; the
+    wall time is kept alongside for display.
+    """
+
+    MAGIC = b"MCPJ"
+    VERSION = 2
+    HEADER = struct.Struct("<4sHHIQ")  # magic, version, record size, capacity, records written
+    HEADER_SIZE = 32
+    COUNT = struct.Struct("<Q")
+    COUNT_OFFSET = HEADER.size - COUNT.size
+    RECORD = struct.Struct("<ddBBbbf")  # stamp, wall time, event, extruder, pin, value, detail
+
+    # Event types
+    RUNOUT_STATE = 1
+    MOTION_STATE = 2
+    RUNOUT_TRIGGER = 3
+    MOTION_TRIGGER = 4
+    JAM_TRIGGER = 5
+    DEVICE_DOWN = 6
+    DEVICE_UP = 7
+    PRINT_STARTED = 8
+    PRINT_ENDED = 9
+    PRINT_PAUSED = 10
+    PRINT_RESUMED = 11
+
+    # Record type of each trigger event in TRIGGER_EVENTS
+    TRIGGERS = {"runout": RUNOUT_TRIGGER, "motion_timeout": MOTION_TRIGGER, "jam": JAM_TRIGGER}
+
+    EVENT_NAMES = {
+        RUNOUT_STATE: "runout_state",
+        MOTION_STATE: "motion_state",
+        RUNOUT_TRIGGER: "runout_trigger",
+        MOTION_TRIGGER: "motion_trigger",
+        JAM_TRIGGER: "jam_trigger",
+        DEVICE_DOWN: "device_down",
+        DEVICE_UP: "device_up",
+        PRINT_STARTED: "print_started",
+        PRINT_ENDED: "print_ended",
+        PRINT_PAUSED: "print_paused",
+        PRINT_RESUMED: "print_resumed",
+    }
+
+    def __init__(self, path: str, capacity: int, clock=time.monotonic, wall_clock=time.time):
+        self.path = path
+        self.capacity = max(int(capacity), 1)
+        self.clock = clock
+        self.wall_clock = wall_clock
+        self._lock = threading.Lock()
+
+        size = self.HEADER_SIZE + self.capacity * self.RECORD.size
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            reuse = os.fstat(fd).st_size == size
+            if not reuse:
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, size)
+            self._mmap = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+
+        self.count = 0
+        if reuse:
+            magic, version, record_size, capacity, count = self.HEADER.unpack_from(self._mmap, 0)
+            if (magic, version, record_size, capacity) == (self.MAGIC, self.VERSION, self.RECORD.size,
+                                                          self.capacity):
+                self.count = count
+        self.HEADER.pack_into(self._mmap, 0, self.MAGIC, self.VERSION, self.RECORD.size, self.capacity,
+                              self.count)
+
+        newest = self._read(len(self) - 1)[0] if self.count else 0.0
+        self._offset = max(wall_clock(), newest) - clock()
+
+    @classmethod
+    def capacity_for(cls, size_kb: float) -> int:
+        return max(int((size_kb * 1024 - cls.HEADER_SIZE) // cls.RECORD.size), 1)
+
+    def record(self, event: int, extruder: int = 0, pin: int = -1, value: int = 0, detail: float = 0.0):
+        """Append one record, overwriting the oldest once the ring is full"""
+        stamp = self.clock() + self._offset
+        wall_time = self.wall_clock()
+        with self._lock:
+            if self._mmap is None:
+                return
+            offset = self.HEADER_SIZE + (self.count % self.capacity) * self.RECORD.size
+            self.RECORD.pack_into(self._mmap, offset, stamp, wall_time, event, extruder, pin, value, detail)
+            self.count += 1
+            self.COUNT.pack_into(self._mmap, self.COUNT_OFFSET, self.count)
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def _read(self, index: int) -> tuple:
+        """Record by logical index, 0 being the oldest still held"""
+        first = self.count - len(self)
+        offset = self.HEADER_SIZE + ((first + index) % self.capacity) * self.RECORD.size
+        return self.RECORD.unpack_from(self._mmap, offset)
+
+    def _bisect(self, stamp: float, after: bool = False) -> int:
+        """Logical index of the first record stamped at (or, with ``after``, past) ``stamp``"""
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            record_stamp = self._read(middle)[0]
+            if record_stamp < stamp or (after and record_stamp == stamp):
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def query(self, start: Optional[float] = None, end: Optional[float] = None,
+              limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Records in the wall-clock range ``start`` to ``end``, oldest first; ``limit`` keeps the newest.
+
+        The bounds are mapped onto stamps with the current wall clock, so
+        after a clock step a range covers the same elapsed time as before.
+        """
+        with self._lock:
+            if self._mmap is None:
+                return []
+            shift = self.clock() + self._offset - self.wall_clock()
+            first = self._bisect(start + shift) if start is not None else 0
+            last = self._bisect(end + shift, after=True) if end is not None else len(self)
+            if limit is not None:
+                first = max(first, last - limit)
+            records = [self._read(index) for index in range(first, last)]
+
+        return [
+            {
+                "time": wall_time,
+                "event": self.EVENT_NAMES.get(event, str(event)),
+                "extruder": extruder,
+                "pin": pin,
+                "value": value,
+                "detail": round(detail, 3),
+            }
+            for _, wall_time, event, extruder, pin, value, detail in records
+        ]
+
+    def close(self):
+        with self._lock:
+            if self._mmap is not None:
+                self._mmap.flush()
+                self._mmap.close()
+                self._mmap = None
+
+
+class SensorHistory:
+    """Downsampled time series of one extruder's sensors.
+
+    The monitoring loop feeds every sample into the current one-second
+    bucket, held in plain attributes. When a second closes it is written to
+    the finest ring and folded into each coarser ring, so aggregates are
+    kept up to date incrementally and a query only merges stored buckets.
+    Rings are fixed-size arrays indexed by ``bucket number % size``.
+    """
+
+    # (bucket width in seconds, buckets kept): 10 minutes, 6 hours, 24 hours
+    LEVELS = ((1, 600), (10, 2160), (60, 1440))
+
+    FIELDS = (
+        ("number", "q"),  # Bucket number (timestamp // width) the slot currently holds
+        ("seconds", "H"),  # One-second buckets with samples
+        ("samples", "I"),
+        ("present", "I"),  # Samples with filament present
+        ("runout_min", "b"),
+        ("runout_max", "b"),
+        ("rate_min", "f"),  # Pulses in the slowest second with samples, +inf until there is one
+        ("rate_max", "f"),
+        ("pulses", "I"),
+        ("triggers", "H"),
+    )
+
+    def __init__(self):
+        self.levels = []
+        for width, size in self.LEVELS:
+            level = {name: array.array(code, [0]) * size for name, code in self.FIELDS}
+            level["number"] = array.array("q", [-1]) * size
+            self.levels.append((width, size, level))
+        self._newest = [-1] * len(self.levels)  # Newest bucket number per level, so queries need no scan
+
+        self._second = None  # type: Optional[int]
+        self._samples = 0
+        self._present = 0
+        self._triggers = 0
+        self._last_pulse_count = None  # type: Optional[int]
+        self._pulses = 0
+
+    def observe(self, timestamp: float, present: int, pulse_count: int, samples: int = 1):
+        """Add ``samples`` samples, ``present`` of them with filament; ``pulse_count`` is the motion sensor's running total.
+
+        Only called from the monitoring thread; queries from other threads
+        read the rings without locking and may see a bucket mid-update.
+        """
+        second = int(timestamp)
+        if second != self._second:
+            self._close_second()
+            self._second = second
+
+        self._samples += samples
+        self._present += present
+        if self._last_pulse_count is not None and pulse_count > self._last_pulse_count:
+            self._pulses += pulse_count - self._last_pulse_count
+        self._last_pulse_count = pulse_count
+
+    def add_second(self, timestamp: float, present: int, pulse_count: int, samples: int):
+        """Add a whole second of samples counted by the caller and close it"""
+        self.observe(timestamp, present, pulse_count, samples)
+        self._close_second()
+
+    def mark_trigger(self, timestamp: float):
+        if int(timestamp) != self._second:
+            self._close_second()
+            self._second = int(timestamp)
+        self._triggers += 1
+
+    def _close_second(self):
+        if self._second is None or not (self._samples or self._triggers):
+            return
+
+        second = self._second
+        samples = self._samples
+        present = self._present
+        runout_min = 1 if samples and present == samples else 0
+        runout_max = 1 if present else 0
+        pulses = self._pulses
+        triggers = self._triggers
+
+        for index, (width, size, level) in enumerate(self.levels):
+            number = second // width
+            slot = number % size
+            if level["number"][slot] != number:
+                level["number"][slot] = number
+                if number > self._newest[index]:
+                    self._newest[index] = number
+                level["seconds"][slot] = 0
+                level["samples"][slot] = 0
+                level["present"][slot] = 0
+                level["runout_min"][slot] = 1
+                level["runout_max"][slot] = 0
+                level["rate_min"][slot] = math.inf
+                level["rate_max"][slot] = 0.0
+                level["pulses"][slot] = 0
+                level["triggers"][slot] = 0
+
+            if samples:
+                level["seconds"][slot] += 1
+                level["samples"][slot] += samples
+                level["present"][slot] += present
+                level["runout_min"][slot] = min(level["runout_min"][slot], runout_min)
+                level["runout_max"][slot] = max(level["runout_max"][slot], runout_max)
+                level["rate_min"][slot] = min(level["rate_min"][slot], pulses)
+                level["rate_max"][slot] = max(level["rate_max"][slot], pulses)
+                level["pulses"][slot] += pulses
+            level["triggers"][slot] += triggers
+
+        self._samples = 0
+        self._present = 0
+        self._pulses = 0
+        self._triggers = 0
+
+    def query(self, start: float, end: float, resolution: float) -> List[Dict[str, Any]]:
+        """Buckets of ``resolution`` seconds between ``start`` and ``end``, up to the last completed second"""
+        # Finest level that still covers the start of the range and is no finer than needed
+        chosen = self.levels[-1]
+        for (width, size, level), newest in zip(self.levels, self._newest):
+            newest *= width
+            if width <= resolution and newest - size * width <= start:
+                chosen = (width, size, level)
+                break
+        width, size, level = chosen
+        resolution = max(resolution, width)
+
+        merged = {}  # type: Dict[int, List]
+        first, last = int(start // width), int(end // width)
+        numbers = level["number"]
+        for number in range(max(first, last - size + 1), last + 1):
+            slot = number % size
+            if numbers[slot] != number:
+                continue
+            key = int(number * width // resolution)
+            bucket = merged.get(key)
+            values = (level["seconds"][slot], level["samples"][slot], level["present"][slot],
+                      level["runout_min"][slot], level["runout_max"][slot], level["rate_min"][slot],
+                      level["rate_max"][slot], level["pulses"][slot], level["triggers"][slot])
+            if bucket is None:
+                merged[key] = list(values)
+                continue
+            bucket[0] += values[0]
+            bucket[1] += values[1]
+            bucket[2] += values[2]
+            bucket[3] = min(bucket[3], values[3])
+            bucket[4] = max(bucket[4], values[4])
+            bucket[5] = min(bucket[5], values[5])
+            bucket[6] = max(bucket[6], values[6])
+            bucket[7] += values[7]
+            bucket[8] += values[8]
+
+        return [
+            {
+                "time": key * resolution,
+                "runout": {
+                    "min": bool(runout_min),
+                    "max": bool(runout_max),
+                    "mean": round(present / samples, 3) if samples else None,
+                },
+                "rate": {
+                    "min": rate_min if seconds else None,
+                    "max": rate_max if seconds else None,
+                    "mean": round(pulses / seconds, 3) if seconds else 0.0,
+                },
+                "pulses": pulses,
+                "triggers": triggers,
+            }
+            for key, (seconds, samples, present, runout_min, runout_max, rate_min, rate_max, pulses, triggers)
+            in sorted(merged.items())
+        ]
+
+
+class StatusPublisher:
+    """Coalesce status changes into rate-limited delta messages for the UI.
+
+    The monitoring loop offers a flat snapshot of the pushed fields, keyed by
+    their dotted path in the ``_get_status`` response. At most one message is
+    produced per ``min_interval`` and it carries only the fields that changed
+    since the previous message, so bursts of changes collapse into one push.
+    Clients drop messages whose ``seq`` is not newer than the last one they
+    applied, so one publisher lives as long as the plugin.
+    """
+
+    def __init__(self, max_rate: float = 4.0):
+        self.min_interval = None  # type: Optional[float]
+        self.seq = 0
+        self.pushes = 0
+        self._last = {}  # type: Dict[str, Any]
+        self._next_push_at = 0.0
+        self.configure(max_rate)
+
+    def configure(self, max_rate: float):
+        """Apply a new rate limit after a settings change; the next message carries every field again"""
+        self.min_interval = 1.0 / max_rate if max_rate > 0 else None
+        self._last = {}
+        self._next_push_at = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.min_interval is not None
+
+    def due(self, current_time: float) -> bool:
+        return self.enabled and current_time >= self._next_push_at
+
+    def build_delta(self, snapshot: Dict[str, Any], current_time: float) -> Optional[Dict[str, Any]]:
+        """Diff ``snapshot`` against the last pushed state. Returns a message, or None if nothing changed."""
+        last = self._last
+        changes = {key: value for key, value in snapshot.items() if key not in last or last[key] != value}
+        if not changes:
+            return None
+
+        self._last.update(changes)
+        self._next_push_at = current_time + self.min_interval
+        self.seq += 1
+        self.pushes += 1
+        return {"type": "status_delta", "seq": self.seq, "changes": changes}
+
+
+class ActionDispatcher:
+    """Run trigger actions on a dedicated worker thread.
+
+    The monitoring loop only enqueues ``(event, extruder)`` pairs, so a
+    printer comm layer that blocks in ``pause_print()`` or ``commands()``
+    cannot stall sampling. Actions are dispatched in the order they were
+    submitted; a pair already waiting in the queue is not queued twice and
+    submissions beyond ``max_pending`` are dropped.
+    """
+
+    def __init__(self, handler, max_pending: int = 32, logger: Optional[logging.Logger] = None):
+        self.handler = handler  # Called as handler(event, extruder_idx) on the worker thread
+        self.max_pending = max_pending
+        self._logger = logger or logging.getLogger(__name__)
+        self._queue = deque()  # type: deque
+        self._pending = set()
+        self._condition = threading.Condition()
+        self._thread = None  # type: Optional[threading.Thread]
+        self._running = False
+
+        self.dispatched = 0
+        self.deduplicated = 0
+        self.dropped = 0
+        self.errors = 0
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+        self._latency_total = 0.0
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._worker, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0):
+        """Stop the worker once the queued actions have been dispatched"""
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def submit(self, event: str, extruder_idx: int, current_time: Optional[float] = None) -> bool:
+        """Queue an action without blocking. Returns False if it was a duplicate or dropped."""
+        if current_time is None:
+            current_time = time.monotonic()
+        key = (event, extruder_idx)
+
+        with self._condition:
+            if key in self._pending:
+                self.deduplicated += 1
+                return False
+            if len(self._queue) >= self.max_pending:
+                self.dropped += 1
+                self._logger.error(f"Action queue full, dropping {event} action for E{extruder_idx}")
+                return False
+            self._pending.add(key)
+            self._queue.append((key, current_time))
+            self._condition.notify()
+        return True
+
+    def _worker(self):
+        while True:
+            with self._condition:
+                while not self._queue and self._running:
+                    self._condition.wait()
+                if not self._queue:
+                    return
+                key, queued_at = self._queue.popleft()
+                self._pending.discard(key)
+
+            latency = time.monotonic() - queued_at
+            self.last_latency = latency
+            self.max_latency = max(self.max_latency, latency)
+            self._latency_total += latency
+            self.dispatched += 1
+
+            try:
+                self.handler(*key)
+            except Exception as e:
+                self.errors += 1
+                self._logger.error(f"Error running {key[0]} action for E{key[1]}: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        mean_latency = self._latency_total / self.dispatched if self.dispatched else 0.0
+        return {
+            "pending": len(self._queue),
+            "dispatched": self.dispatched,
+            "deduplicated": self.deduplicated,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "last_latency_ms": round(self.last_latency * 1000.0, 3),
+            "mean_latency_ms": round(mean_latency * 1000.0, 3),
+            "max_latency_ms": round(self.max_latency * 1000.0, 3),
+        }
+
+
+class DeadlineScheduler:
+    """Drift-free periodic scheduler for the monitoring loop.
+
+    Each tick targets an absolute deadline on the monotonic clock, so USB
+    latency and processing time do not stretch the period. Deadlines that
+    have already passed are skipped rather than run back to back.
+    """
+
+    # Upper bounds (seconds) of the achieved-interval histogram buckets
+    HISTOGRAM_BOUNDS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0)
+    BUCKET_LABELS = tuple(f"<={bound * 1000:g}ms" for bound in HISTOGRAM_BOUNDS) + (f">{HISTOGRAM_BOUNDS[-1] * 1000:g}ms",)
+
+    def __init__(self, clock=time.monotonic, sleep=time.sleep):
+        self._clock = clock
+        self._sleep = sleep
+        self._deadline = None
+        self._last_tick = None
+
+        self.overruns = 0
+        self.skipped_ticks = 0
+        self.max_jitter = 0.0
+        self.target_interval = 0.0
+        self.last_interval = 0.0
+        self.histogram = Histogram(self.HISTOGRAM_BOUNDS)
+
+    def reset(self):
+        """Forget the current deadline, e.g. after an error pause"""
+        self._deadline = None
+        self._last_tick = None
+
+    def wait(self, interval: float) -> bool:
+        """Sleep until the next deadline ``interval`` after the previous one.
+
+        The sleep function may return True to signal an early wakeup (as
+        ``threading.Event.wait`` does); the schedule then restarts from the
+        next call and True is returned. An ``interval`` of zero or less runs
+        the next tick immediately, without deadline or skip accounting.
+        """
+        now = self._clock()
+        self.target_interval = interval
+        if interval <= 0:
+            self._deadline = None
+            delay = 0.0
+        else:
+            if self._deadline is None:
+                self._deadline = now
+            self._deadline += interval
+
+            if now > self._deadline:
+                # Missed the deadline - skip the ticks we can no longer meet
+                missed = int((now - self._deadline) // interval) + 1
+                self.overruns += 1
+                self.skipped_ticks += missed
+                self._deadline += missed * interval
+            delay = self._deadline - now
+
+        if self._sleep(delay):
+            self.reset()
+            return True
+
+        tick = self._clock()
+        if self._last_tick is not None:
+            self._record_interval(tick - self._last_tick, interval)
+        self._last_tick = tick
         return False
-        
-    def get_motion_timeout_status(self, timeout_seconds: float) -> bool:
-        """Check if motion has timed out"""
-        if self.sensor_type != 'motion':
-            return False
-        return (time.time() - self.last_motion_time) > timeout_seconds
-        
-    def get_motion_rate(self, window_seconds: float = 10.0) -> float:
-        """Get motion rate (pulses per second) over the specified window"""
-        if self.sensor_type != 'motion':
-            return 0.0
-            
-        current_time = time.time()
-        cutoff_time = current_time - window_seconds
-        
-        # Count pulses in the time window
-        recent_pulses = [t for t in self.motion_history if t >= cutoff_time]
-        return len(recent_pulses) / window_seconds
+
+    def _record_interval(self, achieved: float, target: float):
+        self.last_interval = achieved
+        jitter = abs(achieved - target)
+        if jitter > self.max_jitter:
+            self.max_jitter = jitter
+        self.histogram.observe(achieved)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get overrun counts and the achieved-interval histogram"""
+        return {
+            "overruns": self.overruns,
+            "skipped_ticks": self.skipped_ticks,
+            "max_jitter_ms": round(self.max_jitter * 1000, 3),
+            "interval_histogram": dict(zip(self.BUCKET_LABELS, self.histogram.counts)),
+        }
 
 
 class MCP2221FilamentSensorPlugin(
@@ -145,51 +2611,78 @@ class MCP2221FilamentSensorPlugin(
         self._logger = logging.getLogger("octoprint.plugins.mcp2221_filament_sensor")
 
         # Hardware interface
-        self.mcp = None
+        self.devices = []  # type: List[BridgeDevice]
         self.use_mock = False
 
+        # Compiled settings snapshot, replaced as a whole on settings changes
+        self.config = None  # type: Optional[MonitorConfig]
+        self.action_handlers = {}  # @action name -> handler registered through ACTION_HOOK
+
         # Sensor objects
-        self.sensors = {}  # Dict of extruder -> {'runout': SensorState, 'motion': SensorState}
+        self.sensors = SensorBank()
+        self.history = {}  # type: Dict[int, SensorHistory]  # Kept across settings changes
 
         # Monitoring
         self.monitoring_thread = None
         self.monitoring_active = False
         self.monitor_lock = threading.Lock()
+        self.wakeup_event = threading.Event()  # Set to wake the loop on state changes
+        self.scheduler = DeadlineScheduler(sleep=self.wakeup_event.wait)
+        self.deep_idle = False
+        self.burst_sampling = False  # Bridges are sampled by burst readers rather than once per cycle
+        self.status_publisher = StatusPublisher()
+        self.action_dispatcher = ActionDispatcher(self._dispatch_action, logger=self._logger)
+        self.journal = None  # type: Optional[EventJournal]
+        self.trigger_counts = {"runout": 0, "motion_timeout": 0, "jam": 0}
+        self.profiler = None  # type: Optional[LoopProfiler]  # Only set while profiling is enabled
+        self.profile_sampling = threading.Lock()  # Held by the one /profile?sample= run allowed at a time
+        self.clock = time.monotonic  # Sensor pipeline time source, simulated during replays
+        self.reopen_inline = False  # Reconnects open the bridge on the monitoring loop, only during replays
 
         # State tracking
         self.current_extruder = 0
         self.is_printing = False
         self.print_paused = False
-        self.last_gcode_analysis = {}
+        self.last_gcode_analysis = ExtrusionTracker()
 
-        # Trigger tracking
-        self.triggered_extruders = set()  # Track which extruders have triggered sensors
+    @property
+    def mcp(self):
+        """Handle of the primary (first) MCP2221A bridge"""
+        return self.devices[0].mcp if self.devices else None
+
+    @property
+    def ioc_active(self) -> bool:
+        return any(device.ioc_active for device in self.devices)
 
     ##~~ SettingsPlugin mixin
 
     def get_settings_defaults(self):
-        return {
+        defaults = {
             # Hardware settings
             "use_mock": False,
             "poll_interval": 0.01,  # Fast polling for event-like behavior (10ms)
+            "devices": "",  # Comma-separated USB serial numbers or #N enumeration indices; empty = first bridge
+            "device_read_timeout": 0.02,  # Max wait per cycle for a bridge when several are configured
+            "reconnect_max_attempts": 0,  # Reopen attempts per outage before giving up, 0 = keep trying
+            "fallback_to_mock": False,  # Substitute the mock for a bridge that cannot be opened
+            "motion_ioc_enabled": False,  # Latch GP1 motion pulses with interrupt-on-change
+            "motion_ioc_edge": "raising",  # "raising", "falling" or "both"
+            "ioc_poll_interval": 0.05,  # Latch read interval when no motion pin needs fast polling
+            "burst_sampling_enabled": False,  # Sample bridges back to back while printing instead of polling
+            "burst_window": 0.02,  # Interval at which buffered burst samples are evaluated
+            "burst_sample_interval": 0.001,  # Minimum spacing of burst reads, 0 = as fast as the bridge answers
+            "burst_buffer_size": 4096,  # Samples buffered per bridge between evaluations
+            "burst_isolated_enabled": False,  # Run each burst reader in its own process (Python 3.8+)
+            "deep_idle_enabled": False,  # Stop USB polling entirely while no print is active
+            "status_push_max_rate": 4.0,  # Max live status messages per second to the UI, 0 = UI polls instead
+            "profiling_enabled": False,  # Time each monitoring loop stage, see /profile
+            "journal_enabled": True,  # Keep sensor transitions and triggers in a ring buffer file
+            "journal_size_kb": 4096,  # Journal file size, about 256k events
+            "extrusion_tracking_enabled": False,  # Detect jams from commanded extrusion instead of a fixed timeout
+            "jam_length_ratio": 4.0,  # Jam after this many pulses' worth of commanded filament without motion
             
-            # Extruder 0 settings
-            "e0_enabled": True,
-            "e0_runout_pin": 0,
-            "e0_runout_inverted": False,
-            "e0_motion_pin": 1,
-            "e0_motion_inverted": False,
-            "e0_motion_timeout": 30.0,  # 30 seconds before motion timeout
-            "e0_debounce_time": 0.5,   # 500ms debounce to prevent false triggers
-            
-            # Extruder 1 settings
-            "e1_enabled": True,
-            "e1_runout_pin": 2,
-            "e1_runout_inverted": False,
-            "e1_motion_pin": 3,
-            "e1_motion_inverted": False,
-            "e1_motion_timeout": 30.0,  # 30 seconds before motion timeout
-            "e1_debounce_time": 0.5,   # 500ms debounce to prevent false triggers
+            # Number of configured tools, each with its own eN_* settings below
+            "extruder_count": 2,
             
             # G-code action settings (one field per error type)
             "runout_gcode": "M600\n; Filament runout detected\nM117 Insert filament and resume",
@@ -204,11 +2697,47 @@ class MCP2221FilamentSensorPlugin(
             "debug_logging": False,
         }
 
+        # Per-extruder settings. E0 and E1 share the single MCP2221A by default,
+        # further tools are disabled and default to the same pins on the next bridges.
+        for extruder_idx in range(MAX_EXTRUDERS):
+            prefix = f"e{extruder_idx}_"
+            defaults.update({
+                prefix + "enabled": extruder_idx < 2,
+                prefix + "device": extruder_idx // 2,  # Index into the configured bridges
+                prefix + "runout_pin": (extruder_idx * 2) % 4,
+                prefix + "runout_inverted": False,
+                prefix + "motion_pin": (extruder_idx * 2 + 1) % 4,
+                prefix + "motion_inverted": False,
+                prefix + "motion_timeout": 30.0,  # 30 seconds before motion timeout
+                prefix + "debounce_time": 0.5,  # Runout level must dominate for 500ms to prevent false triggers
+                prefix + "runout_filter": IntegratingFilter.KIND,
+                prefix + "motion_filter": PulseWidthFilter.KIND,
+                prefix + "motion_filter_time": 0.002,  # Motion levels shorter than this are glitches
+                prefix + "mm_per_pulse": 2.88,  # Filament length per motion sensor state change
+            })
+
+        return defaults
+
     def on_settings_save(self, data):
         old_debug = self._settings.get_boolean(["debug_logging"])
+        old_ioc = (self._settings.get_boolean(["motion_ioc_enabled"]), self._settings.get(["motion_ioc_edge"]))
+        old_journal = (self._settings.get_boolean(["journal_enabled"]), self._settings.get_float(["journal_size_kb"]))
 
         octoprint.plugin.SettingsPlugin.on_settings_save(self, data)
 
+        new_journal = (self._settings.get_boolean(["journal_enabled"]), self._settings.get_float(["journal_size_kb"]))
+        if old_journal != new_journal:
+            self._open_journal()
+
+        # Reconfigure the GP1 interrupt-on-change latch if its settings changed
+        new_ioc = (self._settings.get_boolean(["motion_ioc_enabled"]), self._settings.get(["motion_ioc_edge"]))
+        if old_ioc != new_ioc and self.devices:
+            with self.monitor_lock:
+                # Burst readers share the handle; the next cycle restarts them
+                for device in self.devices:
+                    device.stop_burst()
+                self._configure_motion_ioc()
+
         # Update debug logging level
         new_debug = self._settings.get_boolean(["debug_logging"])
         if old_debug != new_debug:
@@ -262,6 +2791,8 @@ class MCP2221FilamentSensorPlugin(
             self._logger.warning(f"Could not determine initial print state: {e}")
             self.is_printing = False
 
+        self._open_journal()
+
         # Initialize hardware
         self._initialize_hardware()
 
@@ -273,6 +2804,8 @@ class MCP2221FilamentSensorPlugin(
     def on_shutdown(self):
         self._logger.info("MCP2221A Filament Sensor Plugin shutting down...")
         self._stop_monitoring()
+        self.action_dispatcher.stop()
+        self._close_journal()
         self._cleanup_hardware()
 
     ##~~ EventHandlerPlugin mixin
@@ -281,7 +2814,10 @@ class MCP2221FilamentSensorPlugin(
         if event == Events.PRINT_STARTED:
             self.is_printing = True
             self.print_paused = False
-            self.triggered_extruders.clear()
+            self.sensors.clear_triggers()
+            self.last_gcode_analysis.reset()
+            self._rebaseline_extrusion()
+            self._journal_event(EventJournal.PRINT_STARTED)
             self._logger.info(
                 f"Print started - enabling sensor monitoring (is_printing={self.is_printing})"
             )
@@ -289,24 +2825,34 @@ class MCP2221FilamentSensorPlugin(
         elif event == Events.PRINT_DONE or event == Events.PRINT_FAILED or event == Events.PRINT_CANCELLED:
             self.is_printing = False
             self.print_paused = False
-            self.triggered_extruders.clear()
+            self.sensors.clear_triggers()
+            self._journal_event(EventJournal.PRINT_ENDED)
             self._logger.info(
                 f"Print ended ({event}) - disabling runout actions (is_printing={self.is_printing})"
             )
 
         elif event == Events.PRINT_PAUSED:
             self.print_paused = True
+            self._journal_event(EventJournal.PRINT_PAUSED)
             self._logger.info(
                 f"Print paused (is_printing={self.is_printing}, print_paused={self.print_paused})"
             )
 
         elif event == Events.PRINT_RESUMED:
             self.print_paused = False
-            self.triggered_extruders.clear()  # Reset triggers on resume
+            self.sensors.clear_triggers()  # Reset triggers on resume
+            self._rebaseline_extrusion()  # Moves sent while paused are not expected to show motion
+            self._journal_event(EventJournal.PRINT_RESUMED)
             self._logger.info(
                 f"Print resumed - resetting sensor triggers (is_printing={self.is_printing}, print_paused={self.print_paused})"
             )
 
+        else:
+            return
+
+        # Apply the transition right away instead of on the next poll tick
+        self._wake_monitoring()
+
     ##~~ ProgressPlugin mixin
 
     def on_print_progress(self, storage, path, progress):
@@ -316,19 +2862,31 @@ class MCP2221FilamentSensorPlugin(
     ##~~ GcodeHook to track extruder changes
 
     def process_gcode(self, comm_instance, phase, cmd, cmd_type, gcode, *args, **kwargs):
-        """Track extruder changes via T commands"""
-        if gcode and gcode.startswith('T'):
-            try:
-                extruder_num = int(gcode[1:])
-                if extruder_num in [0, 1]:
-                    old_extruder = self.current_extruder
-                    self.current_extruder = extruder_num
-                    if old_extruder != self.current_extruder:
-                        self._logger.debug(f"Active extruder changed to E{self.current_extruder}")
-            except (ValueError, IndexError):
-                pass  # Invalid T command, ignore
+        """Track the active tool from T and M6 commands.
+
+        Registered for ``octoprint.comm.protocol.gcode.sent``, so it runs for
+        every line sent to the printer. OctoPrint has already parsed the
+        command code into ``gcode`` ("T" for any tool select), so lines that
+        neither move the extruder nor change tools return after two set
+        lookups.
+        """
+        if gcode in EXTRUSION_CODES:
+            config = self.config
+            if config is not None and config.extrusion_tracking:
+                self.last_gcode_analysis.feed(gcode, cmd, self.current_extruder)
+            return
+
+        if gcode not in TOOL_CHANGE_CODES:
+            return
+
+        match = TOOL_NUMBER_RE.match(cmd)
+        if match is None:
+            return  # Bare M6 executes the tool already selected by T, or T?/Tx style MMU commands
 
-        return cmd
+        extruder_num = int(match.group(1))
+        if extruder_num != self.current_extruder:
+            self.current_extruder = extruder_num
+            self._logger.debug(f"Active extruder changed to E{extruder_num}")
 
     ##~~ SimpleApiPlugin mixin
 
@@ -358,46 +2916,253 @@ class MCP2221FilamentSensorPlugin(
     def _get_status(self):
         """Get current sensor status"""
         status = {
-            "hardware_connected": self.mcp is not None and (self.use_mock or getattr(self.mcp, 'is_connected', False)),
+            "hardware_connected": bool(self.devices) and all(device.readable for device in self.devices),
             "is_printing": self.is_printing,
             "current_extruder": self.current_extruder,
             "use_mock": getattr(self, 'use_mock', False),
+            "ioc_active": self.ioc_active,
+            "hid_transactions": {
+                "total": sum(device.transactions.total for device in self.devices),
+                "per_second": round(sum(device.transactions.get_rate() for device in self.devices), 1),
+            },
+            "devices": [
+                {
+                    "label": device.label,
+                    "state": device.state,
+                    "mock": device.is_mock,
+                    "ioc_active": device.ioc_active,
+                    "transactions_per_second": round(device.transactions.get_rate(), 1),
+                    "stalls": device.stalls,
+                    "burst": device.bursting,
+                    "burst_isolated": device.isolated,
+                    "burst_reads": device.burst_reads,
+                    "burst_overruns": device.burst_overruns,
+                    "reconnects": device.reconnects,
+                    "reconnect_attempts": device.reconnect_attempts,
+                    "downtime_seconds": round(device.get_downtime(), 1),
+                    "error": str(device.read_error) if device.read_error else None,
+                }
+                for device in self.devices
+            ],
+            "deep_idle": self.deep_idle,
+            "status_seq": self.status_publisher.seq,
+            "scheduler": self.scheduler.get_stats(),
+            "actions": self.action_dispatcher.get_stats(),
+            "profile": self.profiler.get_stats() if self.profiler is not None else None,
             "sensors": {}
         }
 
-        for extruder_idx in [0, 1]:
-            if extruder_idx in self.sensors:
-                extruder_sensors = self.sensors[extruder_idx]
-                status["sensors"][f"e{extruder_idx}"] = {
-                    "runout": {
-                        "state": extruder_sensors["runout"].last_stable_state,
-                        "pin": extruder_sensors["runout"].pin,
-                        "triggered": extruder_idx in self.triggered_extruders
-                    },
-                    "motion": {
-                        "state": extruder_sensors["motion"].last_stable_state,
-                        "pin": extruder_sensors["motion"].pin,
-                        "last_motion": extruder_sensors["motion"].last_motion_time,
-                        "timeout": extruder_sensors["motion"].get_motion_timeout_status(
-                            self._settings.get_float([f"e{extruder_idx}_motion_timeout"])
-                        ),
-                        "rate": extruder_sensors["motion"].get_motion_rate()
-                    }
+        bank = self.sensors
+        current_time = self.clock()
+        for slot, extruder_idx in enumerate(bank.extruders):
+            runout_sensor = bank.runout[slot]
+            motion_sensor = bank.motion[slot]
+            status["sensors"][f"e{extruder_idx}"] = {
+                "runout": {
+                    "state": runout_sensor.last_stable_state,
+                    "pin": runout_sensor.pin,
+                    "filter": get_filter_stats(runout_sensor.filter),
+                    "triggered": bank.triggered[slot]
+                },
+                "device": bank.devices[slot],
+                "motion": {
+                    "state": motion_sensor.last_stable_state,
+                    "pin": motion_sensor.pin,
+                    "filter": get_filter_stats(motion_sensor.filter),
+                    "last_motion": self._to_wall_time(motion_sensor.last_motion_time),
+                    "timeout": self._motion_stalled(slot, current_time),
+                    "rate": motion_sensor.get_motion_rate(current_time=current_time),
+                    "rates": motion_sensor.get_motion_rates(current_time),
+                    "feed_rate": round(motion_sensor.get_feed_rate(current_time), 2),
+                    "intervals": motion_sensor.interval_stats.get_stats(),
+                    "pulse_count": motion_sensor.pulse_count
+                }
+            }
+            if bank.jam_lengths[slot]:
+                extruded = self.last_gcode_analysis.get_extruded(extruder_idx)
+                status["sensors"][f"e{extruder_idx}"]["extrusion"] = {
+                    "commanded_mm": round(extruded, 2),
+                    "pending_mm": round(extruded - bank.extruded_at_pulse[slot], 2),
+                    "jam_length_mm": round(bank.jam_lengths[slot], 2),
                 }
 
         return status
 
+    def _motion_stalled(self, slot: int, current_time: float) -> bool:
+        """Whether a slot's motion sensor currently indicates a jam, by length or by timeout"""
+        bank = self.sensors
+        if bank.jam_lengths[slot]:
+            pending = self.last_gcode_analysis.get_extruded(bank.extruders[slot]) - bank.extruded_at_pulse[slot]
+            return pending > bank.jam_lengths[slot]
+        return bank.motion[slot].get_motion_timeout_status(bank.motion_timeouts[slot], current_time)
+
+    def _render_metrics(self) -> str:
+        """Prometheus text exposition of counters the loop already maintains"""
+        # _initialize_sensors() swaps the bank without the monitor lock, so only this reference is read
+        bank = self.sensors
+        lines = []
+
+        def label_pairs(labels):
+            # Bridge labels come from the settings, so values are escaped as the text format requires
+            return [
+                f'{key}="' + str(label).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+                for key, label in labels.items()
+            ]
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP mcp2221_{name} {help_text}")
+            lines.append(f"# TYPE mcp2221_{name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(label_pairs(labels))
+                lines.append(f"mcp2221_{name}{{{label_text}}} {value}" if label_text else f"mcp2221_{name} {value}")
+
+        def histogram(name, help_text, samples):
+            """samples: (labels, bucket bounds, per-bucket counts incl. overflow, sum)"""
+            lines.append(f"# HELP mcp2221_{name} {help_text}")
+            lines.append(f"# TYPE mcp2221_{name} histogram")
+            for labels, bounds, counts, total in samples:
+                prefix = "".join(pair + "," for pair in label_pairs(labels))
+                cumulative = 0
+                for bound, bucket in zip(bounds, counts):
+                    cumulative += bucket
+                    lines.append(f'mcp2221_{name}_bucket{{{prefix}le="{bound:g}"}} {cumulative}')
+                lines.append(f'mcp2221_{name}_bucket{{{prefix}le="+Inf"}} {sum(counts)}')
+                suffix = "{" + prefix.rstrip(",") + "}" if prefix else ""
+                lines.append(f"mcp2221_{name}_sum{suffix} {total}")
+                lines.append(f"mcp2221_{name}_count{suffix} {sum(counts)}")
+
+        scheduler = self.scheduler
+        metric("poll_interval_target_seconds", "gauge", "Current target interval of the monitoring loop",
+               [({}, scheduler.target_interval)])
+        metric("poll_interval_last_seconds", "gauge", "Last achieved interval of the monitoring loop",
+               [({}, scheduler.last_interval)])
+        metric("poll_jitter_max_seconds", "gauge", "Largest deviation of an interval from its target",
+               [({}, scheduler.max_jitter)])
+        metric("poll_overruns_total", "counter", "Loop iterations that missed their deadline",
+               [({}, scheduler.overruns)])
+        metric("poll_skipped_ticks_total", "counter", "Deadlines skipped after overruns",
+               [({}, scheduler.skipped_ticks)])
+        histogram("poll_interval_seconds", "Achieved monitoring loop intervals",
+                  [({}, scheduler.histogram.bounds, scheduler.histogram.counts, scheduler.histogram.sum)])
+        metric("deep_idle", "gauge", "1 while polling is suspended", [({}, int(self.deep_idle))])
+        metric("printing", "gauge", "1 while a print is active", [({}, int(self.is_printing))])
+
+        devices = list(self.devices)
+        device_labels = [{"device": device.label} for device in devices]
+        metric("device_up", "gauge", "1 if the bridge is connected",
+               [(labels, int(device.state == BridgeDevice.CONNECTED)) for labels, device in zip(device_labels, devices)])
+        metric("hid_transactions_total", "counter", "USB HID transactions",
+               [(labels, device.transactions.total) for labels, device in zip(device_labels, devices)])
+        metric("read_errors_total", "counter", "Failed bridge reads",
+               [(labels, device.read_errors) for labels, device in zip(device_labels, devices)])
+        metric("read_stalls_total", "counter", "Cycles in which a bridge did not answer in time",
+               [(labels, device.stalls) for labels, device in zip(device_labels, devices)])
+        metric("burst_reads_total", "counter", "GPIO reads taken by the burst reader",
+               [(labels, device.burst_reads) for labels, device in zip(device_labels, devices)])
+        metric("burst_overruns_total", "counter", "Burst reads overwritten before they were evaluated",
+               [(labels, device.burst_overruns) for labels, device in zip(device_labels, devices)])
+        metric("reconnects_total", "counter", "Successful bridge reopens",
+               [(labels, device.reconnects) for labels, device in zip(device_labels, devices)])
+        histogram("hid_read_latency_seconds", "Duration of GPIO_read HID transactions",
+                  [(labels, device.read_latency.bounds, device.read_latency.counts, device.read_latency.sum)
+                   for labels, device in zip(device_labels, devices)])
+
+        now = self.clock()
+        sensor_labels = [
+            {"extruder": f"e{extruder_idx}", "pin": f"gp{bank.motion[slot].pin}"}
+            for slot, extruder_idx in enumerate(bank.extruders)
+        ]
+        metric("motion_pulses_total", "counter", "Motion sensor pulses since sensors were configured",
+               [(labels, motion.pulse_count) for labels, motion in zip(sensor_labels, bank.motion)])
+        metric("seconds_since_motion", "gauge", "Time since the last motion pulse",
+               [(labels, round(now - motion.last_motion_time, 3)) for labels, motion in zip(sensor_labels, bank.motion)])
+        metric("feed_rate_mm_per_second", "gauge", "Filament feed rate estimated from recent pulse intervals",
+               [(labels, round(motion.get_feed_rate(now), 3)) for labels, motion in zip(sensor_labels, bank.motion)])
+        metric("pulse_interval_cv", "gauge", "Coefficient of variation of recent pulse intervals",
+               [(labels, round(motion.interval_stats.recent_cv, 4)) for labels, motion in zip(sensor_labels, bank.motion)])
+        histogram("pulse_interval_seconds", "Intervals between motion pulses, excluding pauses",
+                  [(labels, motion.interval_stats.histogram.bounds, motion.interval_stats.histogram.counts,
+                    motion.interval_stats.histogram.sum) for labels, motion in zip(sensor_labels, bank.motion)])
+        metric("filter_glitches_total", "counter", "Sensor level changes rejected by the filter",
+               [({"extruder": f"e{extruder_idx}", "sensor": sensor.sensor_type}, sensor.filter.glitches)
+                for extruder_idx, runout, motion in zip(bank.extruders, bank.runout, bank.motion)
+                for sensor in (runout, motion)])
+        metric("filament_present", "gauge", "1 if the runout sensor detects filament",
+               [({"extruder": f"e{extruder_idx}"}, int(bool(runout.last_stable_state)))
+                for extruder_idx, runout in zip(bank.extruders, bank.runout)])
+        metric("triggers_total", "counter", "Triggered actions by type",
+               [({"type": kind}, count) for kind, count in self.trigger_counts.items()])
+
+        lines.append("")
+        return "\n".join(lines)
+
+    @staticmethod
+    def _to_wall_time(monotonic_time: float) -> float:
+        """Convert a monotonic sensor timestamp to a wall-clock time for display"""
+        return time.time() - (time.monotonic() - monotonic_time)
+
+    # Motion rates are pushed in buckets of this many pulses/sec so jitter does not cause pushes
+    RATE_PUSH_RESOLUTION = 0.5
+
+    def _collect_push_state(self) -> Dict[str, Any]:
+        """Flat snapshot of the live-pushed status fields, keyed by their path in _get_status"""
+        state = {
+            "hardware_connected": bool(self.devices) and all(device.readable for device in self.devices),
+            "is_printing": self.is_printing,
+            "current_extruder": self.current_extruder,
+            "deep_idle": self.deep_idle,
+        }
+
+        for index, device in enumerate(self.devices):
+            state[f"devices.{index}.state"] = device.state
+
+        bank = self.sensors
+        resolution = self.RATE_PUSH_RESOLUTION
+        current_time = self.clock()
+        for slot, extruder_idx in enumerate(bank.extruders):
+            prefix = f"sensors.e{extruder_idx}."
+            motion_sensor = bank.motion[slot]
+            state[prefix + "runout.state"] = bank.runout[slot].last_stable_state
+            state[prefix + "runout.triggered"] = bank.triggered[slot]
+            state[prefix + "motion.timeout"] = self._motion_stalled(slot, current_time)
+            state[prefix + "motion.rate"] = round(
+                motion_sensor.get_motion_rate(current_time=current_time) / resolution
+            ) * resolution
+            state[prefix + "motion.feed_rate"] = round(motion_sensor.get_feed_rate(current_time), 1)
+
+        return state
+
+    def _publish_status(self, force: bool = False):
+        """Push changed status fields to the UI, at most status_push_max_rate times per second"""
+        publisher = self.status_publisher
+        current_time = time.monotonic()
+        if not publisher.enabled or not (force or publisher.due(current_time)):
+            return
+
+        message = publisher.build_delta(self._collect_push_state(), current_time)
+        if message is not None:
+            self._plugin_manager.send_plugin_message(self._identifier, message)
+
     def _test_sensors(self):
         """Test sensor functionality"""
-        if not self.mcp:
+        if not self.devices:
             return {"error": "Hardware not connected"}
 
         try:
             if hasattr(self.mcp, "GPIO_read"):
-                readings = self.mcp.GPIO_read()
+                device_readings = {}
+                with self.monitor_lock:
+                    for device in self.devices:
+                        if not device.readable:
+                            device_readings[device.label] = device.state
+                            continue
+                        if not device.bursting:  # Otherwise the burst reader keeps the snapshot fresh
+                            device.read()
+                        device_readings[device.label] = device.readings
                 return {
                     "test_result": "success",
-                    "raw_readings": readings,
+                    "raw_readings": self.devices[0].readings,
+                    "devices": device_readings,
                     "timestamp": time.time(),
                 }
             else:
@@ -420,6 +3185,88 @@ class MCP2221FilamentSensorPlugin(
         """Blueprint route for sensor status"""
         return flask.jsonify(self._get_status())
 
+    # Bucket count a /history query aims for when no resolution is given
+    HISTORY_POINTS = 500
+
+    @octoprint.plugin.BlueprintPlugin.route("/history", methods=["GET"])
+    def blueprint_api_history(self):
+        """Blueprint route for downsampled sensor history, ?from=&to= (epoch seconds), ?resolution= (seconds)"""
+        end = flask.request.args.get("to", default=time.time(), type=float)
+        start = flask.request.args.get("from", default=end - 3600.0, type=float)
+        resolution = flask.request.args.get("resolution", type=float)
+        extruder = flask.request.args.get("extruder", type=int)
+
+        if end <= start:
+            return flask.make_response(flask.jsonify({"error": "'to' must be after 'from'"}), 400)
+        if not resolution or resolution <= 0:
+            resolution = max((end - start) / self.HISTORY_POINTS, 1.0)
+
+        return flask.jsonify({
+            "from": start,
+            "to": end,
+            "resolution": resolution,
+            "sensors": {
+                f"e{extruder_idx}": history.query(start, end, resolution)
+                for extruder_idx, history in sorted(self.history.items())
+                if extruder is None or extruder == extruder_idx
+            },
+        })
+
+    @octoprint.plugin.BlueprintPlugin.route("/journal", methods=["GET"])
+    def blueprint_api_journal(self):
+        """Blueprint route for journaled sensor events, filtered by ?from=&to= (epoch seconds) and ?limit="""
+        journal = self.journal
+        if journal is None:
+            return flask.jsonify({"enabled": False, "records": []})
+
+        start = flask.request.args.get("from", type=float)
+        end = flask.request.args.get("to", type=float)
+        limit = flask.request.args.get("limit", default=1000, type=int)
+
+        return flask.jsonify({
+            "enabled": True,
+            "capacity": journal.capacity,
+            "written": journal.count,
+            "records": journal.query(start, end, limit),
+        })
+
+    # Longest on-demand stack sampling run, seconds; it blocks the request thread for that long
+    PROFILE_MAX_SECONDS = 5.0
+
+    @octoprint.plugin.BlueprintPlugin.route("/profile", methods=["GET"])
+    def blueprint_api_profile(self):
+        """Blueprint route for loop stage timings; ?sample=N also samples the loop's stack for N seconds (admin only)"""
+        if not Permissions.ADMIN.can():
+            return flask.make_response(flask.jsonify({"error": "Admin permission required"}), 403)
+
+        profiler = self.profiler
+        result = {
+            "enabled": profiler is not None,
+            "poll_interval": self.scheduler.target_interval,
+            "stages": profiler.get_stats() if profiler is not None else None,
+        }
+
+        duration = flask.request.args.get("sample", type=float)
+        if duration:
+            if profiler is None:
+                return flask.make_response(flask.jsonify({"error": "Profiling is disabled"}), 409)
+            thread = self.monitoring_thread
+            if thread is None or not thread.is_alive():
+                return flask.make_response(flask.jsonify({"error": "Monitoring loop is not running"}), 409)
+            if not self.profile_sampling.acquire(blocking=False):
+                return flask.make_response(flask.jsonify({"error": "A stack sampling run is already in progress"}), 409)
+            try:
+                result["stack_profile"] = sample_thread_stacks(thread.ident, min(duration, self.PROFILE_MAX_SECONDS))
+            finally:
+                self.profile_sampling.release()
+
+        return flask.jsonify(result)
+
+    @octoprint.plugin.BlueprintPlugin.route("/metrics", methods=["GET"])
+    def blueprint_api_metrics(self):
+        """Blueprint route for Prometheus scraping"""
+        return flask.Response(self._render_metrics(), mimetype="text/plain; version=0.0.4; charset=utf-8")
+
     @octoprint.plugin.BlueprintPlugin.route("/test", methods=["POST"])
     def blueprint_api_test(self):
         """Blueprint route for sensor testing"""
@@ -428,71 +3275,250 @@ class MCP2221FilamentSensorPlugin(
     ##~~ Hardware Management
 
     def _initialize_hardware(self):
-        """Initialize MCP2221A hardware connection"""
+        """Initialize MCP2221A hardware connections"""
         self.use_mock = self._settings.get_boolean(["use_mock"])
 
+        devices = []
+        for index, (label, device_args) in enumerate(self._parse_device_specs(self._settings.get(["devices"]))):
+            devices.append(self._open_device(index, label, device_args))
+        self.devices = devices
+        self.use_mock = any(device.is_mock for device in devices)
+
+        self._configure_motion_ioc()
+
+        # Concurrent readers only pay off with several bridges
+        if len(devices) > 1:
+            for device in devices:
+                device.start_reader()
+
+        # Initialize sensor objects
+        self._initialize_sensors()
+
+    @staticmethod
+    def _parse_device_specs(spec: Optional[str]):
+        """Parse the ``devices`` setting into (label, EasyMCP2221.Device kwargs) pairs.
+
+        Entries are USB serial numbers, or ``#N`` for the Nth enumerated
+        bridge. An empty setting selects the first bridge found.
+        """
+        specs = []
+        for entry in (spec or "").split(","):
+            entry = entry.strip()
+            if not entry:
+                continue
+            if entry.startswith("#") and entry[1:].isdigit():
+                specs.append((entry, {"devnum": int(entry[1:])}))
+            else:
+                specs.append((entry, {"usbserial": entry}))
+        return specs or [("default", {})]
+
+    def _open_device(self, index: int, label: str, device_args: Dict[str, Any]) -> BridgeDevice:
+        """Open one bridge.
+
+        If it cannot be opened the bridge is either replaced by a mock, when
+        ``fallback_to_mock`` is set, or left to the reconnect supervisor.
+        """
         if self.use_mock or not MCP2221A_AVAILABLE:
-            self._logger.info("Using mock MCP2221A for testing")
-            self.mcp = MockMCP2221A()
-            self.use_mock = True
-        else:
+            self._logger.info(f"Using mock MCP2221A for testing ({label})")
+            return BridgeDevice(index, MockMCP2221A(usbserial=label), label, is_mock=True)
+
+        try:
+            mcp = self._open_handle(device_args)
+            self._logger.info(f"EasyMCP2221 hardware initialized successfully ({label})")
+            return BridgeDevice(index, mcp, label, device_args=device_args)
+        except Exception as e:
+            self._logger.error(f"Failed to initialize MCP2221A hardware ({label}): {e}")
+            if self._settings.get_boolean(["fallback_to_mock"]):
+                self._logger.info("Falling back to mock mode")
+                return BridgeDevice(index, MockMCP2221A(usbserial=label), label, is_mock=True)
+            self._logger.info(f"Will keep trying to open {label}")
+            return BridgeDevice(index, None, label, device_args=device_args)
+
+    @staticmethod
+    def _open_handle(device_args: Dict[str, Any]):
+        """Open an EasyMCP2221 device and configure its pins as GPIO inputs"""
+        mcp = EasyMCP2221.Device(**device_args)
+        # Configure pins as GPIO inputs for sensor reading
+        mcp.set_pin_function(
+            gp0="GPIO_IN",  # E0 runout sensor
+            gp1="GPIO_IN",  # E0 motion sensor
+            gp2="GPIO_IN",  # E1 runout sensor
+            gp3="GPIO_IN",  # E1 motion sensor
+        )
+        return mcp
+
+    def _configure_motion_ioc(self):
+        """Switch GP1 of each bridge between plain GPIO input and interrupt-on-change latching"""
+        for device in self.devices:
+            if device.mcp is not None:
+                self._configure_device_ioc(device)
+
+    def _configure_device_ioc(self, device: BridgeDevice):
+        """Configure GP1 of one bridge for interrupt-on-change if a motion sensor uses it"""
+        ioc_enabled = self._settings.get_boolean(["motion_ioc_enabled"])
+        edge = self._settings.get(["motion_ioc_edge"])
+        extruder_count = min(self._settings.get_int(["extruder_count"]) or 1, MAX_EXTRUDERS)
+
+        device.ioc_active = False
+        device.ioc_edge = None
+
+        gp1_is_motion_pin = any(
+            self._settings.get_boolean([f"e{extruder_idx}_enabled"])
+            and (self._settings.get_int([f"e{extruder_idx}_device"]) or 0) == device.index
+            and self._settings.get_int([f"e{extruder_idx}_motion_pin"]) == IOC_PIN
+            for extruder_idx in range(extruder_count)
+        )
+        if ioc_enabled and not gp1_is_motion_pin:
+            self._logger.warning(f"Interrupt-on-change requires a motion sensor on GP1 of {device.label}, "
+                                 f"using polling instead")
+
+        if not ioc_enabled or not gp1_is_motion_pin:
             try:
-                self.mcp = EasyMCP2221.Device()
-                # Configure pins as GPIO inputs for sensor reading
-                self.mcp.set_pin_function(
-                    gp0="GPIO_IN",  # E0 runout sensor
-                    gp1="GPIO_IN",  # E0 motion sensor
-                    gp2="GPIO_IN",  # E1 runout sensor
-                    gp3="GPIO_IN",  # E1 motion sensor
-                )
-                self._logger.info("EasyMCP2221 hardware initialized successfully")
+                device.mcp.set_pin_function(gp1="GPIO_IN")
             except Exception as e:
-                self._logger.error(f"Failed to initialize MCP2221A hardware: {e}")
-                self._logger.info("Falling back to mock mode")
-                self.mcp = MockMCP2221A()
-                self.use_mock = True
+                self._logger.error(f"Failed to configure GP1 of {device.label} as GPIO input: {e}")
+            return
 
-        # Initialize sensor objects
-        self._initialize_sensors()
+        try:
+            device.mcp.set_pin_function(gp1="IOC")
+            device.mcp.IOC_config(edge=edge)
+            device.mcp.IOC_clear()
+            device.ioc_active = True
+            device.ioc_edge = edge
+            self._logger.info(f"GP1 motion sensor on {device.label} using interrupt-on-change ({edge} edge)")
+        except Exception as e:
+            self._logger.error(f"Failed to enable interrupt-on-change on GP1 of {device.label}, "
+                               f"falling back to polling: {e}")
+            try:
+                device.mcp.set_pin_function(gp1="GPIO_IN")
+            except Exception:
+                pass
 
     def _initialize_sensors(self):
         """Initialize sensor state objects based on settings"""
-        self.sensors.clear()
+        self.action_handlers = self._collect_action_handlers()
+        config = MonitorConfig.from_settings(
+            self._settings, ActionPlan.BUILTIN_ACTIONS + tuple(self.action_handlers)
+        )
 
-        for extruder_idx in [0, 1]:
-            if self._settings.get_boolean([f"e{extruder_idx}_enabled"]):
+        sensors = SensorBank()
+        for extruder_idx, extruder_config in config.extruders.items():
+            if extruder_config.enabled:
                 # Runout sensor
                 runout_sensor = SensorState(
-                    pin=self._settings.get_int([f"e{extruder_idx}_runout_pin"]),
+                    pin=extruder_config.runout_pin,
                     sensor_type="runout",
-                    inverted=self._settings.get_boolean([f"e{extruder_idx}_runout_inverted"]),
-                    debounce_time=self._settings.get_float([f"e{extruder_idx}_debounce_time"])
+                    inverted=extruder_config.runout_inverted,
+                    debounce_time=extruder_config.debounce_time,
+                    filter_kind=extruder_config.runout_filter,
                 )
 
-                # Motion sensor
+                # Motion sensor. A pulse is recorded per rising edge, two state changes,
+                # unless GP1 latches both edges in hardware.
+                device = self.devices[extruder_config.device] if extruder_config.device < len(self.devices) else None
+                both_edges = (device is not None and device.ioc_active and extruder_config.motion_pin == IOC_PIN
+                              and self._settings.get(["motion_ioc_edge"]) == "both")
                 motion_sensor = SensorState(
-                    pin=self._settings.get_int([f"e{extruder_idx}_motion_pin"]),
+                    pin=extruder_config.motion_pin,
                     sensor_type="motion",
-                    inverted=self._settings.get_boolean([f"e{extruder_idx}_motion_inverted"]),
-                    debounce_time=self._settings.get_float([f"e{extruder_idx}_debounce_time"])
+                    inverted=extruder_config.motion_inverted,
+                    debounce_time=extruder_config.motion_filter_time,
+                    filter_kind=extruder_config.motion_filter,
+                    mm_per_pulse=extruder_config.mm_per_pulse * (1 if both_edges else 2),
+                    clock=self.clock,
                 )
 
-                self.sensors[extruder_idx] = {
-                    "runout": runout_sensor,
-                    "motion": motion_sensor
-                }
+                if extruder_config.device >= len(self.devices):
+                    self._logger.error(f"E{extruder_idx} is assigned to bridge {extruder_config.device} "
+                                       f"but only {len(self.devices)} configured, skipping")
+                    continue
 
-                self._logger.info(f"Initialized sensors for E{extruder_idx}: "
+                jam_length = config.jam_length_ratio * extruder_config.mm_per_pulse if config.extrusion_tracking else 0.0
+                sensors.add(extruder_idx, runout_sensor, motion_sensor, extruder_config.motion_timeout,
+                            device=extruder_config.device, jam_length=jam_length)
+                # Keep triggers that fired before a mid-print settings save
+                sensors.set_triggered(extruder_idx, self.sensors.is_triggered(extruder_idx))
+
+                self._logger.info(f"Initialized sensors for E{extruder_idx}: bridge={extruder_config.device}, "
                                 f"runout=pin{runout_sensor.pin}, motion=pin{motion_sensor.pin}")
 
-    def _cleanup_hardware(self):
-        """Clean up hardware connections"""
-        if self.mcp and hasattr(self.mcp, 'close'):
+        for extruder_idx in sensors.extruders:
+            if extruder_idx not in self.history:
+                self.history[extruder_idx] = SensorHistory()
+
+        if not self._settings.get_boolean(["profiling_enabled"]):
+            self.profiler = None
+        elif self.profiler is None:
+            self.profiler = LoopProfiler()
+
+        self._rebaseline_extrusion(sensors)
+        self.sensors = sensors
+        self.config = config
+        self.status_publisher.configure(self._settings.get_float(["status_push_max_rate"]) or 0.0)
+
+    def _open_journal(self):
+        """(Re)open the event journal according to the current settings"""
+        self._close_journal()
+        if not self._settings.get_boolean(["journal_enabled"]):
+            return
+
+        capacity = EventJournal.capacity_for(self._settings.get_float(["journal_size_kb"]) or 0.0)
+        try:
+            path = os.path.join(self.get_plugin_data_folder(), "journal.bin")
+            self.journal = EventJournal(path, capacity)
+            self._logger.info(f"Event journal at {path}: {len(self.journal)} of {capacity} records in use")
+        except Exception as e:
+            self._logger.error(f"Could not open event journal, events will not be recorded: {e}")
+
+    def _close_journal(self):
+        journal, self.journal = self.journal, None
+        if journal is not None:
+            journal.close()
+
+    def _journal_event(self, event: int, extruder: int = 0, pin: int = -1, value: int = 0, detail: float = 0.0):
+        journal = self.journal
+        if journal is not None:
+            journal.record(event, extruder, pin, value, detail)
+
+    def _rebaseline_extrusion(self, sensors: Optional[SensorBank] = None):
+        """Treat everything commanded so far as seen by the motion sensors"""
+        if sensors is None:
+            sensors = self.sensors
+        for slot, extruder_idx in enumerate(sensors.extruders):
+            sensors.extruded_at_pulse[slot] = self.last_gcode_analysis.get_extruded(extruder_idx)
+
+    def _collect_action_handlers(self) -> Dict[str, Any]:
+        """Gather @action handlers that other plugins register through ACTION_HOOK"""
+        handlers = {}
+        try:
+            hooks = self._plugin_manager.get_hooks(ACTION_HOOK)
+        except Exception:
+            return handlers
+
+        for plugin_name, hook in hooks.items():
             try:
-                self.mcp.close()
+                for name, handler in (hook() or {}).items():
+                    name = name.lower()
+                    if name in ActionPlan.BUILTIN_ACTIONS:
+                        self._logger.warning(f"Plugin {plugin_name} cannot override built-in action @{name}")
+                        continue
+                    handlers[name] = handler
             except Exception as e:
-                self._logger.error(f"Error closing MCP2221A: {e}")
-        self.mcp = None
+                self._logger.error(f"Error collecting actions from plugin {plugin_name}: {e}")
+        return handlers
+
+    def _cleanup_hardware(self):
+        """Clean up hardware connections"""
+        for device in self.devices:
+            device.stop_reader()
+            device.stop_burst()
+            device.stop_opening()
+            if device.mcp is not None and hasattr(device.mcp, 'close'):
+                try:
+                    device.mcp.close()
+                except Exception as e:
+                    self._logger.error(f"Error closing MCP2221A ({device.label}): {e}")
+        self.devices = []
 
     ##~~ Monitoring
 
@@ -501,6 +3527,7 @@ class MCP2221FilamentSensorPlugin(
         if self.monitoring_thread and self.monitoring_thread.is_alive():
             return
 
+        self.action_dispatcher.start()
         self.monitoring_active = True
         self.monitoring_thread = threading.Thread(target=self._monitoring_loop, daemon=True)
         self.monitoring_thread.start()
@@ -509,92 +3536,529 @@ class MCP2221FilamentSensorPlugin(
     def _stop_monitoring(self):
         """Stop the sensor monitoring thread"""
         self.monitoring_active = False
+        self._wake_monitoring()
         if self.monitoring_thread and self.monitoring_thread.is_alive():
             self.monitoring_thread.join(timeout=2.0)
+        self._set_burst_sampling(False)
         self._logger.info("Sensor monitoring thread stopped")
 
+    def _wake_monitoring(self):
+        """Wake the monitoring loop so it re-evaluates print state immediately"""
+        self.wakeup_event.set()
+
+    def _set_burst_sampling(self, enabled: bool):
+        """Switch between burst sampling and one read per cycle; burst readers start on the next cycle"""
+        with self.monitor_lock:
+            if enabled == self.burst_sampling:
+                return
+            self.burst_sampling = enabled
+            if not enabled:
+                for device in self.devices:
+                    device.stop_burst()
+                    if device.released_handle is not None:
+                        self._restore_handle(device)
+        self._logger.info("Burst sampling " + ("started" if enabled else "stopped"))
+        if enabled and self.config.burst_isolated and not SHARED_MEMORY_AVAILABLE:
+            self._logger.warning("Isolated burst sampling needs Python 3.8 or later, sampling in threads instead")
+
     def _restart_monitoring(self):
         """Restart monitoring with new settings"""
         self._stop_monitoring()
         self._initialize_sensors()
         self._start_monitoring()
 
+    def _fast_poll_required(self, config: MonitorConfig) -> bool:
+        """Whether any enabled motion sensor relies on polling to catch pulses"""
+        return any(
+            extruder.enabled and not (
+                extruder.motion_pin == IOC_PIN
+                and extruder.device < len(self.devices)
+                and self.devices[extruder.device].ioc_active
+            )
+            for extruder in config.extruders.values()
+        )
+
     def _monitoring_loop(self):
         """Main sensor monitoring loop - optimized for pulse detection"""
-        base_poll_interval = self._settings.get_float(["poll_interval"])
+        base_poll_interval = self.config.poll_interval
+        fast_poll = self._fast_poll_required(self.config)
+        self.scheduler.reset()
 
         while self.monitoring_active:
             try:
+                self.wakeup_event.clear()
+                # A stop between the loop check and clear() would otherwise be lost before a deep idle wait
+                if not self.monitoring_active:
+                    break
+
+                burst = self.config.burst_sampling and fast_poll and self.is_printing and not self.print_paused
+                if burst != self.burst_sampling:
+                    self._set_burst_sampling(burst)
+
+                # Deep idle - no USB traffic until a print starts or settings change
+                if self.config.deep_idle_enabled and not self.is_printing and not self.config.prevent_print_start:
+                    if not self.deep_idle:
+                        self.deep_idle = True
+                        self._logger.info("No active print - entering deep idle, sensor polling suspended")
+                        self._publish_status(force=True)
+                    self.wakeup_event.wait()
+                    self.scheduler.reset()
+                    continue
+
+                if self.deep_idle:
+                    self.deep_idle = False
+                    self._logger.info("Leaving deep idle - resuming sensor polling")
+
                 # Adaptive polling rate based on print status
-                if self.is_printing and not self.print_paused:
+                if burst:
+                    # The burst readers sample continuously, the loop only evaluates their buffers
+                    poll_interval = self.config.burst_window
+                elif self.is_printing and not self.print_paused and fast_poll:
                     # Fast polling during active printing for motion pulse detection
-                    poll_interval = min(base_poll_interval, 0.005)  # 5ms max during printing
+                    poll_interval = min(base_poll_interval, FAST_POLL_INTERVAL)  # 5ms max during printing
+                elif self.is_printing and not self.print_paused:
+                    # Motion pulses are latched in hardware, only the latch needs reading
+                    poll_interval = max(base_poll_interval, self.config.ioc_poll_interval)
                 else:
                     # Slower polling when idle to conserve CPU
                     poll_interval = max(base_poll_interval, 0.1)   # 100ms min when idle
 
-                with self.monitor_lock:
-                    self._check_sensors()
+                profiler = self.profiler
+                if profiler is None:
+                    with self.monitor_lock:
+                        self._check_sensors()
+                    self._publish_status()
+                else:
+                    pass_start = time.perf_counter_ns()
+                    with self.monitor_lock:
+                        profiler.record("lock_wait", time.perf_counter_ns() - pass_start)
+                        self._check_sensors()
+                    publish_start = time.perf_counter_ns()
+                    self._publish_status()
+                    pass_end = time.perf_counter_ns()
+                    profiler.record("publish", pass_end - publish_start)
+                    profiler.record("pass", pass_end - pass_start)
 
-                time.sleep(poll_interval)
+                self.scheduler.wait(poll_interval)
 
             except Exception as e:
                 self._logger.error(f"Error in monitoring loop: {e}")
-                time.sleep(1.0)  # Longer delay on error
+                self.wakeup_event.wait(1.0)  # Longer delay on error
+                self.scheduler.reset()
+
+    ##~~ Connection supervision
+
+    def replay_scenario(self, scenario: Scenario, duration: Optional[float] = None, poll_interval: float = 0.005,
+                        printing: bool = True) -> Dict[str, Any]:
+        """Run the sensor pipeline over a scenario on a simulated clock and report what it would have triggered.
+
+        The current extruder settings are used with a single simulated bridge,
+        read inline like one real bridge. The replay runs on a separate plugin
+        instance, so the live monitoring state is neither locked nor touched.
+        Triggered actions are recorded, not sent to the printer.
+        """
+        if duration is None:
+            duration = scenario.duration
+        # Start well past zero like a real monotonic clock, so fresh sensors accept their first reading
+        clock = SimulatedClock(start=1000.0)
+        start = clock()
+        recorder = _ReplayRecorder(clock)
+        device = BridgeDevice(0, MockMCP2221A(usbserial="replay", scenario=scenario, clock=clock),
+                              "replay", is_mock=True)
+        device.clock = clock
+
+        replay = type(self)()
+        replay._settings = self._settings
+        replay._logger = self._logger
+        replay._plugin_manager = getattr(self, "_plugin_manager", None)  # Only read for @action handlers
+        replay._identifier = getattr(self, "_identifier", None)
+        replay._printer = _ReplayPrinter(printing)
+        replay.clock = clock
+        replay.reopen_inline = True
+        replay.devices = [device]
+        replay.action_dispatcher = recorder
+        replay.current_extruder = self.current_extruder
+        replay.is_printing = printing
+
+        replay._initialize_sensors()
+        replay._configure_device_ioc(device)
+        for sensor in replay.sensors.motion:
+            sensor.last_motion_time = clock()
+
+        polls = 0
+        while clock() - start < duration:
+            replay._check_sensors()
+            clock.advance(poll_interval)
+            polls += 1
+
+        return {
+            "triggers": recorder.triggers,
+            "polls": polls,
+            "duration": clock() - start,
+            "device": {
+                "state": device.state,
+                "read_errors": device.read_errors,
+                "reconnects": device.reconnects,
+                "downtime": round(device.get_downtime(clock()), 3),
+            },
+        }
+
+    def _record_device_success(self, device: BridgeDevice, current_time: float):
+        if device.state != BridgeDevice.CONNECTED:
+            outage = current_time - device.down_since if device.down_since is not None else 0.0
+            self._logger.info(f"MCP2221A {device.label} recovered after {outage:.1f}s")
+            self._journal_event(EventJournal.DEVICE_UP, device.index, detail=outage)
+        device.record_success(current_time)
+
+    def _record_device_failure(self, device: BridgeDevice, error: Exception, current_time: float):
+        """Track a failed read, logging state transitions rather than every error"""
+        previous_state = device.state
+        device.record_failure(error, current_time)
+
+        if previous_state == BridgeDevice.CONNECTED:
+            self._logger.error(f"Error reading sensors on {device.label}: {error}")
+            self._journal_event(EventJournal.DEVICE_DOWN, device.index)
+        elif device.state != previous_state and device.reconnect_attempts == 0:
+            self._logger.warning(f"MCP2221A {device.label} not responding after {device.consecutive_errors} "
+                                 f"reads, reconnecting: {error}")
+
+    def _supervise_devices(self, current_time: float):
+        """Reopen bridges whose reconnect backoff has elapsed.
+
+        Finding and opening a USB device can take seconds, so the open runs
+        on the device's opener thread and its handle is swapped in on a
+        later cycle, while the healthy bridges keep being sampled.
+        """
+        for device in self.devices:
+            if device.opening:
+                opened = device.take_opened()
+                if opened is not None:
+                    self._finish_reconnect(device, *opened, current_time)
+            elif device.state == BridgeDevice.RECONNECTING and current_time >= device.next_retry_at:
+                self._reconnect_device(device, current_time)
+
+    def _reconnect_device(self, device: BridgeDevice, current_time: float):
+        device.schedule_retry(current_time)
+
+        previous = device.mcp
+        if previous is not None and hasattr(previous, 'close'):
+            try:
+                previous.close()
+            except Exception:
+                pass
+        # A closed mock is kept so the same simulated bridge can be reopened later
+        device.mcp = previous if device.is_mock else None
+
+        if not self.reopen_inline:
+            device.open_in_background(lambda: self._reopen_handle(device, previous))
+            return
+        try:
+            mcp = self._reopen_handle(device, previous)
+        except Exception as e:
+            self._finish_reconnect(device, None, e, current_time)
+        else:
+            self._finish_reconnect(device, mcp, None, current_time)
+
+    def _finish_reconnect(self, device: BridgeDevice, mcp, error: Optional[Exception], current_time: float):
+        """Install a reopened handle, or account for a failed reconnect attempt"""
+        if error is None:
+            device.record_reopen(mcp)
+            self._configure_device_ioc(device)
+            self._logger.debug(f"Reopened MCP2221A {device.label} (reconnect #{device.reconnects})")
+            return
+
+        device.read_error = error
+        max_attempts = self._settings.get_int(["reconnect_max_attempts"]) or 0
+        if max_attempts and device.reconnect_attempts >= max_attempts:
+            if self._settings.get_boolean(["fallback_to_mock"]):
+                self._logger.error(f"Giving up on {device.label} after {device.reconnect_attempts} "
+                                   f"attempts, switching to mock: {error}")
+                device.mcp = MockMCP2221A(usbserial=device.label)
+                device.is_mock = True
+                self.use_mock = True
+                self._record_device_success(device, current_time)
+            else:
+                self._logger.error(f"Giving up on {device.label} after {device.reconnect_attempts} "
+                                   f"attempts: {error}")
+                device.state = BridgeDevice.FAILED
+        elif device.reconnect_attempts & (device.reconnect_attempts - 1) == 0:
+            # Log attempts 1, 2, 4, 8... to keep a long outage quiet
+            self._logger.warning(f"Reconnect attempt {device.reconnect_attempts} for {device.label} failed, "
+                                 f"retrying in {max(device.next_retry_at - current_time, 0.0):.1f}s: {error}")
+
+    def _reopen_handle(self, device: BridgeDevice, previous):
+        if device.is_mock:
+            return previous.reopen() if isinstance(previous, MockMCP2221A) else MockMCP2221A(usbserial=device.label)
+        return self._open_handle(device.device_args)
+
+    def _restore_handle(self, device: BridgeDevice):
+        """Reopen the handle a bridge closed while its sampler process owned it"""
+        released, device.released_handle = device.released_handle, None
+        if device.state in (BridgeDevice.CONNECTED, BridgeDevice.DEGRADED):
+            try:
+                device.mcp = self._reopen_handle(device, released)
+                self._configure_device_ioc(device)
+                return
+            except Exception as e:
+                current_time = self.clock()
+                self._record_device_failure(device, e, current_time)
+                device.state = BridgeDevice.RECONNECTING
+                device.next_retry_at = current_time
+        # Left to the reconnect supervisor; a closed mock is kept so the same simulated bridge can be reopened
+        device.mcp = released if device.is_mock else None
+
+    def _read_devices(self, config: MonitorConfig, device_indices) -> List[bool]:
+        """Take a fresh snapshot from each listed bridge.
+
+        Returns a per-device list of flags marking which snapshots are fresh.
+        A single bridge is read inline. With several
+        bridges the reads run concurrently on the reader threads; a device
+        that misses ``device_read_timeout``, or is still stuck on a previous
+        read, is left out of this cycle without delaying the others.
+        """
+        devices = self.devices
+        fresh = [False] * len(devices)
+
+        if len(devices) == 1:
+            device = devices[0]
+            if device.readable:
+                try:
+                    device.read()
+                except Exception as e:
+                    self._record_device_failure(device, e, self.clock())
+                else:
+                    fresh[0] = True
+                    if device.state != BridgeDevice.CONNECTED:
+                        self._record_device_success(device, device.sample_time)
+            return fresh
+
+        requested = [index for index in device_indices if devices[index].readable and devices[index].request()]
+        deadline = time.monotonic() + config.device_read_timeout
+        for index in device_indices:
+            device = devices[index]
+            if index not in requested:
+                if device.readable:
+                    device.stalls += 1
+            elif device.wait(max(deadline - time.monotonic(), 0.0)):
+                if device.read_error is None:
+                    fresh[index] = True
+                    if device.state != BridgeDevice.CONNECTED:
+                        self._record_device_success(device, device.sample_time)
+                else:
+                    self._record_device_failure(device, device.read_error, self.clock())
+            else:
+                device.stalls += 1
+
+        return fresh
 
     def _check_sensors(self):
         """Check all sensors and handle triggers"""
-        if not self.mcp:
+        config = self.config
+        bank = self.sensors
+        if not self.devices or config is None:
             return
 
-        only_active = self._settings.get_boolean(["only_active_extruder"])
+        self._supervise_devices(self.clock())
 
-        for extruder_idx, sensors in self.sensors.items():
-            # Skip disabled extruders
-            if not self._settings.get_boolean([f"e{extruder_idx}_enabled"]):
-                continue
+        only_active = config.only_active_extruder and self.is_printing
+        skip_triggered = self.is_printing
+        current_extruder = self.current_extruder
 
-            # Skip non-active extruders if configured
-            if only_active and self.is_printing and extruder_idx != self.current_extruder:
-                continue
+        active = [
+            # Skip non-active extruders if configured, and already triggered extruders during printing
+            not (only_active and extruder_idx != current_extruder) and not (skip_triggered and triggered)
+            for extruder_idx, triggered in zip(bank.extruders, bank.triggered)
+        ]
+        if not any(active):
+            return
 
-            # Skip already triggered extruders during printing
-            if self.is_printing and extruder_idx in self.triggered_extruders:
-                continue
+        profiler = self.profiler
+        if profiler is not None:
+            read_start = time.perf_counter_ns()
 
-            try:
-                # Read all GPIO pins at once (EasyMCP2221 returns tuple: gp0, gp1, gp2, gp3)
-                gpio_readings = self.mcp.GPIO_read()
+        samples = None
+        try:
+            device_indices = sorted(set(compress(bank.devices, active)))
+            if self.burst_sampling:
+                samples = self._drain_bursts(config, device_indices)
+            else:
+                # One snapshot of all GPIO pins per bridge per cycle, shared by every extruder on it
+                fresh = self._read_devices(config, device_indices)
+        except Exception as e:
+            self._logger.error(f"Error reading sensors: {e}")
+            return
+
+        if profiler is not None:
+            evaluate_start = time.perf_counter_ns()
+            profiler.record("usb_read", evaluate_start - read_start)
 
-                # Extract individual sensor readings
-                runout_sensor = sensors["runout"]
-                motion_sensor = sensors["motion"]
+        if samples is not None:
+            if samples:
+                self._evaluate_samples(config, samples, active)
+            if profiler is not None:
+                profiler.record("evaluate", time.perf_counter_ns() - evaluate_start)
+            return
 
-                runout_reading = gpio_readings[runout_sensor.pin]
-                motion_reading = gpio_readings[motion_sensor.pin]
+        # Combine the fresh bridges into one pin mask with one timestamp
+        shift = SensorBank.PINS_PER_DEVICE
+        device_masks = bank.device_masks
+        mask = scope = latched = 0
+        sample_time = None
+        for device in self.devices:
+            if fresh[device.index]:
+                bits = device_masks[device.index]
+                mask |= device.level_mask << (shift * device.index)
+                if device.ioc_active:
+                    # GP1 is latched in hardware and not readable as a GPIO
+                    ioc_bit = 1 << (shift * device.index + IOC_PIN)
+                    bits &= ~ioc_bit
+                    if device.ioc_latched:
+                        latched |= ioc_bit
+                scope |= bits
+                if sample_time is None or device.sample_time > sample_time:
+                    sample_time = device.sample_time
 
-                # Update sensor states
-                runout_changed = runout_sensor.update(runout_reading)
-                motion_changed = motion_sensor.update(motion_reading)
+        if sample_time is not None:
+            self._evaluate_samples(config, ((sample_time, mask, scope, latched),), active)
 
-                # Check for triggers
-                self._check_runout_trigger(extruder_idx, runout_sensor, runout_changed)
-                self._check_motion_trigger(extruder_idx, motion_sensor)
+        if profiler is not None:
+            profiler.record("evaluate", time.perf_counter_ns() - evaluate_start)
 
-                if self._settings.get_boolean(["debug_logging"]):
-                    if runout_changed or motion_changed:
-                        self._logger.debug(f"E{extruder_idx} sensors: runout={runout_sensor.last_stable_state}, "
-                                        f"motion={motion_sensor.last_stable_state}")
+    def _drain_bursts(self, config: MonitorConfig, device_indices) -> List[tuple]:
+        """Collect what the burst readers sampled since the last cycle, as time-ordered batch samples.
 
-            except Exception as e:
-                self._logger.error(f"Error reading sensors for E{extruder_idx}: {e}")
+        Each bridge's dense trace is reduced to its edges and tick samples
+        (see ``SampleRing``), and the bridges are merged by time. Burst
+        readers that are not running on a readable bridge are (re)started,
+        and a read error that ended one is recorded like a failed read.
+        """
+        bank = self.sensors
+        shift = SensorBank.PINS_PER_DEVICE
+        sensor_bits = 0
+        for bit in bank.bit_sensors:
+            sensor_bits |= bit
+
+        traces = []
+        for index in device_indices:
+            device = self.devices[index]
+            bits = bank.device_bits(index)
+            ioc_bit = 0
+            if device.ioc_active:
+                # GP1 is latched in hardware and not readable as a GPIO
+                ioc_bit = 1 << (shift * index + IOC_PIN)
+                bits &= ~ioc_bit
+
+            samples = device.drain_burst((sensor_bits & bits) >> (shift * index), FAST_POLL_INTERVAL)
+            if samples:
+                if device.state != BridgeDevice.CONNECTED:
+                    self._record_device_success(device, samples[0][0])
+                traces.append([(sample_time, level_mask << (shift * index), bits, ioc_bit if latched else 0)
+                               for sample_time, level_mask, latched in samples])
+            elif device.bursting and device.ring.ready:
+                device.stalls += 1
+
+            if device.burst_error is not None:
+                error, device.burst_error = device.burst_error, None
+                self._record_device_failure(device, error, self.clock())
+            if device.released_handle is not None and not device.bursting:
+                self._restore_handle(device)
+            if not device.bursting and device.readable:
+                device.start_burst(config.burst_buffer_size, config.burst_sample_interval,
+                                   isolated=config.burst_isolated and SHARED_MEMORY_AVAILABLE)
+
+        if len(traces) == 1:
+            return traces[0]
+        return list(heapq.merge(*traces))
+
+    def _evaluate_samples(self, config: MonitorConfig, samples: Iterable[tuple], active: List[bool]):
+        """Run a batch of pin snapshots through the sensors of the active slots.
+
+        Each sample is ``(time, mask, scope, latched)``: the pin levels of every
+        bridge as one mask (see ``SensorBank``), the bits that were read, and
+        the GP1 bits whose interrupt-on-change latch was set. Only sensors
+        whose pin left its expected level, or whose filter is in transition,
+        are evaluated, and motion timeouts are only scanned once the earliest
+        one is due, so a steady sample costs the same however many sensors
+        are configured; filter work grows with the sensors that see an edge,
+        and history is flushed per extruder once a second. A buffered burst
+        is processed in one call.
+        """
+        bank = self.sensors
+        read_samples = bank.read_samples
+        resumable = bank.resumable
+        monitoring_motion = self.is_printing and not self.print_paused
+
+        for sample_time, mask, scope, latched in samples:
+            if sample_time >= bank.second_ends:
+                if bank.history_second is not None:
+                    bank.flush_history(self.history, bank.last_sample_time + bank.wall_offset)
+                bank.wall_offset = time.time() - self.clock()
+                bank.history_second = int(sample_time + bank.wall_offset)
+                bank.second_ends = bank.history_second + 1 - bank.wall_offset
+            read = scope | latched
+            read_samples[read] = read_samples.get(read, 0) + 1
+
+            for entry in bank.changed_entries(mask, scope):
+                slot, sensor, bit = entry
+                if not active[slot]:
+                    continue
+                try:
+                    if bit & resumable:
+                        sensor.filter.resume(bank.last_sample_time)
+                    changed = sensor.update(bool(mask & bit), sample_time)
+                    bank.refresh(entry)
+                    if changed:
+                        self._sensor_changed(config, slot, sensor, sample_time)
+                except Exception as e:
+                    self._logger.error(f"Error processing sensors for E{bank.extruders[slot]}: {e}")
+
+            while latched:
+                bit = latched & -latched
+                latched ^= bit
+                for slot, sensor, _ in bank.bit_sensors.get(bit, ()):
+                    if active[slot] and sensor.sensor_type == "motion" and sensor.record_pulse(sample_time):
+                        self._sensor_changed(config, slot, sensor, sample_time)
+
+            for slot in bank.jam_slots:
+                # ``active`` is fixed for the batch, so a jam raised on an earlier sample must not fire again
+                if active[slot] and not bank.triggered[slot]:
+                    extruder_idx = bank.extruders[slot]
+                    extruded = self.last_gcode_analysis.get_extruded(extruder_idx)
+                    self._check_jam_trigger(extruder_idx, extruded - bank.extruded_at_pulse[slot],
+                                            bank.jam_lengths[slot])
+
+            if monitoring_motion and sample_time > bank.next_deadline():
+                for slot, extruder_idx in enumerate(bank.extruders):
+                    if active[slot] and not bank.jam_lengths[slot]:
+                        self._check_motion_trigger(extruder_idx, bank.motion[slot], bank.motion_timeouts[slot],
+                                                   sample_time)
+                bank.deadlines_dirty = True
+
+            bank.last_sample_time = sample_time
+
+    def _sensor_changed(self, config: MonitorConfig, slot: int, sensor: SensorState, sample_time: float):
+        """Journal, log and act on a sensor whose stable state changed"""
+        bank = self.sensors
+        extruder_idx = bank.extruders[slot]
+        state = sensor.last_stable_state
+
+        if self.journal is not None:
+            event = EventJournal.RUNOUT_STATE if sensor.sensor_type == "runout" else EventJournal.MOTION_STATE
+            self.journal.record(event, extruder_idx, sensor.pin, state)
+
+        if config.debug_logging:
+            self._logger.debug(f"E{extruder_idx} {sensor.sensor_type} sensor: {state}")
+
+        if sensor.sensor_type == "runout":
+            bank.runout_changed(slot)
+            self._check_runout_trigger(extruder_idx, sensor, True)
+        else:
+            bank.deadlines_dirty = True
+            if bank.jam_lengths[slot]:
+                bank.extruded_at_pulse[slot] = self.last_gcode_analysis.get_extruded(extruder_idx)
 
     def _check_runout_trigger(self, extruder_idx: int, sensor: SensorState, state_changed: bool):
         """Check if runout sensor should trigger an action"""
-        # Check if sensor is enabled for this extruder
-        if not self._settings.get_boolean([f"e{extruder_idx}_enabled"]):
-            return
-
         # Only trigger runout actions during printing
         if not self.is_printing:
             # Debug log to track why runouts might be happening when not printing
@@ -616,100 +4080,91 @@ class MCP2221FilamentSensorPlugin(
             self._logger.warning(
                 f"Filament runout detected on E{extruder_idx} during active print"
             )
-            self._trigger_runout_action(extruder_idx)
+            self._trigger_action("runout", extruder_idx)
 
-    def _check_motion_trigger(self, extruder_idx: int, sensor: SensorState):
+    def _check_motion_trigger(self, extruder_idx: int, sensor: SensorState, timeout: float, current_time: float):
         """Check if motion sensor should trigger due to timeout"""
-        # Check if sensor is enabled for this extruder
-        if not self._settings.get_boolean([f"e{extruder_idx}_enabled"]):
-            return
-
         # Only trigger motion timeout actions during printing and not paused
         if not self.is_printing or self.print_paused:
             return
 
-        timeout = self._settings.get_float([f"e{extruder_idx}_motion_timeout"])
-
-        if sensor.get_motion_timeout_status(timeout):
+        if sensor.get_motion_timeout_status(timeout, current_time):
             # Only trigger once per timeout event
-            if time.time() - sensor.last_trigger_time > timeout:
-                sensor.last_trigger_time = time.time()
+            if current_time - sensor.last_trigger_time > timeout:
+                sensor.last_trigger_time = current_time
                 self._logger.warning(f"Motion timeout detected on E{extruder_idx} (no motion for {timeout}s)")
-                self._trigger_motion_timeout_action(extruder_idx)
+                self._trigger_action("motion_timeout", extruder_idx)
 
-    def _trigger_runout_action(self, extruder_idx: int):
-        """Execute actions when filament runout is detected"""
-        self.triggered_extruders.add(extruder_idx)
+    def _check_jam_trigger(self, extruder_idx: int, pending_length: float, jam_length: float):
+        """Check if commanded extrusion has run ahead of the motion sensor by more than jam_length mm"""
+        if not self.is_printing or self.print_paused:
+            return
 
-        # Send notification
-        if self._settings.get_boolean(["notification_enabled"]):
-            self._plugin_manager.send_plugin_message(
-                self._identifier,
-                {
-                    "type": "runout",
-                    "extruder": extruder_idx,
-                    "message": f"Filament runout detected on E{extruder_idx}"
-                }
-            )
+        if pending_length > jam_length:
+            self._logger.warning(f"Filament jam detected on E{extruder_idx} ({pending_length:.1f}mm commanded "
+                                 f"without motion, limit {jam_length:.1f}mm)")
+            self._trigger_action("jam", extruder_idx, pending_length)
 
-        # Execute G-code commands
-        runout_gcode = self._settings.get(["runout_gcode"]).strip()
-        if runout_gcode:
-            gcode_commands = [cmd.strip() for cmd in runout_gcode.split('\n') if cmd.strip()]
-
-            for cmd in gcode_commands:
-                if cmd.startswith('@'):
-                    # OctoPrint action command
-                    if cmd == '@pause':
-                        self._printer.pause_print()
-                elif cmd.startswith(';'):
-                    # Comment - log it
-                    self._logger.info(f"Runout action: {cmd}")
-                else:
-                    # Regular G-code
-                    self._printer.commands(cmd)
-                    self._logger.info(f"Sent runout G-code: {cmd}")
-        else:
-            # Fallback - just pause
-            self._printer.pause_print()
-            self._logger.info("No runout G-code configured, pausing print")
+    def _trigger_action(self, event: str, extruder_idx: int, detail: float = 0.0):
+        """Mark the extruder triggered and queue the event's actions for the dispatcher"""
+        self.sensors.set_triggered(extruder_idx)
+        self.trigger_counts[event] += 1
+        self._journal_event(EventJournal.TRIGGERS[event], extruder_idx, detail=detail)
+        if extruder_idx in self.history:
+            self.history[extruder_idx].mark_trigger(time.time())
+        self.action_dispatcher.submit(event, extruder_idx)
 
-    def _trigger_motion_timeout_action(self, extruder_idx: int):
-        """Execute actions when motion timeout is detected"""
-        self.triggered_extruders.add(extruder_idx)
+    def _dispatch_action(self, event: str, extruder_idx: int):
+        """Notify the UI and run the event's action plan, called on the dispatcher thread"""
+        label = TRIGGER_EVENTS[event][1]
 
         # Send notification
-        if self._settings.get_boolean(["notification_enabled"]):
+        if self.config.notification_enabled:
             self._plugin_manager.send_plugin_message(
                 self._identifier,
                 {
-                    "type": "motion_timeout",
+                    "type": event,
                     "extruder": extruder_idx,
-                    "message": f"Motion timeout detected on E{extruder_idx}"
+                    "message": f"{label} detected on E{extruder_idx}"
                 }
             )
 
-        # Execute G-code commands
-        motion_gcode = self._settings.get(["motion_timeout_gcode"]).strip()
-        if motion_gcode:
-            gcode_commands = [cmd.strip() for cmd in motion_gcode.split('\n') if cmd.strip()]
-
-            for cmd in gcode_commands:
-                if cmd.startswith('@'):
-                    # OctoPrint action command
-                    if cmd == '@pause':
-                        self._printer.pause_print()
-                elif cmd.startswith(';'):
-                    # Comment - log it
-                    self._logger.info(f"Motion timeout action: {cmd}")
-                else:
-                    # Regular G-code
-                    self._printer.commands(cmd)
-                    self._logger.info(f"Sent motion timeout G-code: {cmd}")
-        else:
-            # Fallback - just pause
-            self._printer.pause_print()
-            self._logger.info("No motion timeout G-code configured, pausing print")
+        plan = self.config.action_plans[event].get(extruder_idx)
+        if plan is not None:
+            self._run_action_plan(plan, event, extruder_idx)
+
+    def _run_action_plan(self, plan: ActionPlan, event: str, extruder_idx: int):
+        """Send a compiled action plan, one printer.commands() call per G-code batch"""
+        label = TRIGGER_EVENTS[event][1]
+
+        if plan.fallback:
+            self._logger.info(f"No {label.lower()} G-code configured, pausing print")
+
+        for comment in plan.comments:
+            self._logger.info(f"{label} action: {comment}")
+
+        for kind, payload in plan.steps:
+            if kind == ActionPlan.GCODE:
+                self._printer.commands(list(payload))
+                self._logger.info(f"Sent {label.lower()} G-code: {' | '.join(payload)}")
+                continue
+
+            name, args = payload
+            if name == "pause":
+                self._printer.pause_print()
+            elif name == "resume":
+                self._printer.resume_print()
+            elif name == "cancel":
+                self._printer.cancel_print()
+            else:
+                handler = self.action_handlers.get(name)
+                if handler is None:
+                    self._logger.warning(f"Action @{name} is no longer registered, skipping")
+                    continue
+                try:
+                    handler(extruder_idx, event, args)
+                except Exception as e:
+                    self._logger.error(f"Error running action @{name} for E{extruder_idx}: {e}")
 
     ##~~ Utility methods
 
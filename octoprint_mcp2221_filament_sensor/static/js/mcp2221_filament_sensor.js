@@ -18,24 +18,21 @@ $(function() {
             // Hardware settings
             use_mock: ko.observable(false),
             poll_interval: ko.observable(0.01),
-
-            // Extruder 0 settings
-            e0_enabled: ko.observable(true),
-            e0_runout_pin: ko.observable(0),
-            e0_runout_inverted: ko.observable(false),
-            e0_motion_pin: ko.observable(1),
-            e0_motion_inverted: ko.observable(false),
-            e0_motion_timeout: ko.observable(30.0),
-            e0_debounce_time: ko.observable(0.5),
-
-            // Extruder 1 settings
-            e1_enabled: ko.observable(true),
-            e1_runout_pin: ko.observable(2),
-            e1_runout_inverted: ko.observable(false),
-            e1_motion_pin: ko.observable(3),
-            e1_motion_inverted: ko.observable(false),
-            e1_motion_timeout: ko.observable(30.0),
-            e1_debounce_time: ko.observable(0.5),
+            devices: ko.observable(""),
+            device_read_timeout: ko.observable(0.02),
+            reconnect_max_attempts: ko.observable(0),
+            fallback_to_mock: ko.observable(false),
+            motion_ioc_enabled: ko.observable(false),
+            motion_ioc_edge: ko.observable("raising"),
+            ioc_poll_interval: ko.observable(0.05),
+            burst_sampling_enabled: ko.observable(false),
+            burst_window: ko.observable(0.02),
+            burst_sample_interval: ko.observable(0.001),
+            burst_buffer_size: ko.observable(4096),
+            burst_isolated_enabled: ko.observable(false),
+
+            // Number of configured extruders (per-extruder settings added below)
+            extruder_count: ko.observable(2),
 
             // G-code action settings
             runout_gcode: ko.observable(
@@ -47,12 +44,35 @@ $(function() {
 
             // Advanced settings
             prevent_print_start: ko.observable(false),
+            deep_idle_enabled: ko.observable(false),
+            status_push_max_rate: ko.observable(4.0),
+            extrusion_tracking_enabled: ko.observable(false),
+            jam_length_ratio: ko.observable(4.0),
             only_active_extruder: ko.observable(true),
             notification_enabled: ko.observable(true),
 
             // Debug settings
             debug_logging: ko.observable(false),
+            profiling_enabled: ko.observable(false),
           };
+
+          // Per-extruder settings, E0/E1 enabled on the first MCP2221A, two tools per bridge
+          var pluginSettings = self.settings.plugins.mcp2221_filament_sensor;
+          for (var idx = 0; idx < 8; idx++) {
+            var prefix = "e" + idx + "_";
+            pluginSettings[prefix + "enabled"] = ko.observable(idx < 2);
+            pluginSettings[prefix + "device"] = ko.observable(Math.floor(idx / 2));
+            pluginSettings[prefix + "runout_pin"] = ko.observable((idx * 2) % 4);
+            pluginSettings[prefix + "runout_inverted"] = ko.observable(false);
+            pluginSettings[prefix + "motion_pin"] = ko.observable((idx * 2 + 1) % 4);
+            pluginSettings[prefix + "motion_inverted"] = ko.observable(false);
+            pluginSettings[prefix + "motion_timeout"] = ko.observable(30.0);
+            pluginSettings[prefix + "debounce_time"] = ko.observable(0.5);
+            pluginSettings[prefix + "runout_filter"] = ko.observable("integrating");
+            pluginSettings[prefix + "motion_filter"] = ko.observable("pulse_width");
+            pluginSettings[prefix + "motion_filter_time"] = ko.observable(0.002);
+            pluginSettings[prefix + "mm_per_pulse"] = ko.observable(2.88);
+          }
         }
       };
 
@@ -78,8 +98,11 @@ $(function() {
       self.testResults = ko.observable("");
       self.testingInProgress = ko.observable(false);
 
-      // Auto-refresh status every 5 seconds
+      // Live status arrives as pushed deltas; fall back to polling every
+      // 5 seconds when pushes are disabled in the settings
       self.statusUpdateInterval = null;
+      self.lastStatusSeq = null;
+      self.statusRequestPending = false;
 
       self.onBeforeBinding = function () {
         // Ensure settings structure exists before binding
@@ -101,19 +124,26 @@ $(function() {
         self.stopStatusUpdates();
       };
 
+      self.statusPushEnabled = function () {
+        var pluginSettings = self.settings.plugins.mcp2221_filament_sensor;
+        return !pluginSettings.status_push_max_rate || parseFloat(pluginSettings.status_push_max_rate()) > 0;
+      };
+
       // Start automatic status updates
       self.startStatusUpdates = function () {
         if (self.statusUpdateInterval) {
           clearInterval(self.statusUpdateInterval);
+          self.statusUpdateInterval = null;
         }
 
-        // Update immediately
+        // Update immediately, deltas keep the status current from here
         self.updateStatus();
 
-        // Then update every 5 seconds
-        self.statusUpdateInterval = setInterval(function () {
-          self.updateStatus();
-        }, 5000);
+        if (!self.statusPushEnabled()) {
+          self.statusUpdateInterval = setInterval(function () {
+            self.updateStatus();
+          }, 5000);
+        }
       };
 
       // Stop automatic status updates
@@ -124,17 +154,52 @@ $(function() {
         }
       };
 
+      // Apply a pushed status delta, keyed by dotted paths into the status object
+      self.applyStatusDelta = function (data) {
+        var status = self.sensorStatus();
+        if (self.lastStatusSeq !== null && data.seq > 0 && data.seq <= self.lastStatusSeq) {
+          // Already included in the last full status
+          return;
+        }
+        if (!status || self.lastStatusSeq === null || data.seq !== self.lastStatusSeq + 1) {
+          // Missed a delta (or no baseline yet) - fetch the full status again
+          self.updateStatus();
+          return;
+        }
+
+        status = $.extend(true, {}, status);
+        $.each(data.changes, function (path, value) {
+          var keys = path.split(".");
+          var target = status;
+          for (var i = 0; i < keys.length - 1; i++) {
+            if (target[keys[i]] === undefined || target[keys[i]] === null) {
+              target[keys[i]] = {};
+            }
+            target = target[keys[i]];
+          }
+          target[keys[keys.length - 1]] = value;
+        });
+
+        self.lastStatusSeq = data.seq;
+        self.sensorStatus(status);
+      };
+
       // Update sensor status
       self.updateStatus = function () {
-        if (!self.loginState.loggedIn()) {
+        if (!self.loginState.loggedIn() || self.statusRequestPending) {
           return;
         }
 
+        self.statusRequestPending = true;
         $.ajax({
           url: API_BASEURL + "plugin/mcp2221_filament_sensor",
           type: "GET",
           dataType: "json",
+          complete: function () {
+            self.statusRequestPending = false;
+          },
           success: function (response) {
+            self.lastStatusSeq = response.status_seq;
             self.sensorStatus(response);
           },
           error: function (jqXHR, textStatus, errorThrown) {
@@ -259,6 +324,11 @@ $(function() {
           return;
         }
 
+        if (data.type === "status_delta") {
+          self.applyStatusDelta(data);
+          return;
+        }
+
         // Show notifications for sensor triggers
         if (data.type === "runout") {
           new PNotify({
@@ -274,6 +344,13 @@ $(function() {
             type: "warning",
             hide: false,
           });
+        } else if (data.type === "jam") {
+          new PNotify({
+            title: "Filament Jam",
+            text: data.message,
+            type: "error",
+            hide: false,
+          });
         }
       };
 